@@ -0,0 +1,52 @@
+"""
+Compare two result files saved by benchmarks/run.py.
+
+    python benchmarks/compare.py before.json after.json
+"""
+import json
+import sys
+
+
+METRICS = ("p50", "p99", "queries", "peak_memory")
+
+
+def load(path):
+    with open(path) as f:
+        data = json.load(f)
+    results = {
+        (result["scenario"], result["size"]): result
+        for result in data["results"]
+    }
+    return data["meta"], results
+
+
+def change(before, after):
+    if not before:
+        return "n/a"
+    return "%+.1f%%" % ((after - before) * 100.0 / before)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 2:
+        sys.exit(__doc__)
+
+    before_meta, before = load(argv[0])
+    after_meta, after = load(argv[1])
+    print("before: %s (%s)" % (before_meta["commit"], argv[0]))
+    print("after:  %s (%s)" % (after_meta["commit"], argv[1]))
+
+    for key in before:
+        if key not in after:
+            continue
+        line = "%-28s %6d" % key
+        for metric in METRICS:
+            line += "  %s %s" % (
+                metric,
+                change(before[key][metric], after[key][metric])
+            )
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
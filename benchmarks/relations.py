@@ -0,0 +1,76 @@
+"""
+Microbenchmark of the relation lookups done for every nested field on
+every request, introspecting the model descriptors vs reading the
+relation registry in drf_pretty_update/relations.py.
+
+    python benchmarks/relations.py
+    python benchmarks/relations.py --number 100000
+"""
+import argparse
+import os
+import sys
+import timeit
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from django.db.models.fields.related import (  # noqa: E402
+    ManyToOneRel, ManyToManyRel
+)
+from drf_pretty_update.relations import get_relation  # noqa: E402
+
+
+def introspect(model, field):
+    # What each code path used to do on its own
+    descriptor = getattr(model, field)
+    rel = descriptor.rel
+    if isinstance(rel, ManyToOneRel):
+        foreignkey = descriptor.field
+        return (
+            "many_to_one",
+            foreignkey.name,
+            foreignkey.model._meta.get_field(foreignkey.name).attname
+        )
+    if isinstance(rel, ManyToManyRel):
+        return ("many_to_many", None, None)
+
+
+def registry(model, field):
+    relation = get_relation(model, field)
+    return (
+        relation["type"],
+        relation["foreignkey"],
+        relation["foreignkey_attname"]
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--number", type=int, default=200000)
+    args = parser.parse_args(argv)
+
+    os.environ["DJANGO_SETTINGS_MODULE"] = "benchmarks.settings"
+    import django
+    django.setup()
+
+    from tests.testapp.models import Course, Student
+
+    lookups = [(Course, "books"), (Student, "phone_numbers")]
+    for model, field in lookups:
+        assert introspect(model, field) == registry(model, field)
+        for lookup in (introspect, registry):
+            seconds = timeit.timeit(
+                lambda: lookup(model, field),
+                number=args.number
+            )
+            print(
+                "%-28s %-10s %8.3f us per lookup" % (
+                    "%s.%s" % (model.__name__, field),
+                    lookup.__name__,
+                    seconds * 1e6 / args.number
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Benchmarks for nested create/update.
+
+Measures latency (p50/p99), throughput (nested items per second),
+query count and peak memory of every scenario in benchmarks/scenarios.py
+for each payload size and saves the results as JSON, compare two
+result files with benchmarks/compare.py.
+
+    python benchmarks/run.py --output before.json
+    python benchmarks/run.py --sizes 1 100 --repeat 3 --output after.json
+    python benchmarks/compare.py before.json after.json
+
+Runs on an in memory SQLite database by default, pass --database postgres
+to use a local Postgres configured with the usual PG* environment
+variables (PGDATABASE, PGUSER, PGPASSWORD, PGHOST, PGPORT).
+"""
+import argparse
+import datetime
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+
+class QueryCounter(object):
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    index = max(int(math.ceil(percent / 100.0 * len(values))) - 1, 0)
+    return values[index]
+
+
+def setup_django(database):
+    os.environ["BENCH_DATABASE"] = database
+    os.environ["DJANGO_SETTINGS_MODULE"] = "benchmarks.settings"
+    import django
+    django.setup()
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+
+
+def send(client, method, url, payload):
+    response = getattr(client, method)(url, payload, format="json")
+    if response.status_code >= 300:
+        raise RuntimeError(
+            "%s %s failed with %s: %s" %
+            (method.upper(), url, response.status_code, response.data)
+        )
+    return response
+
+
+def run_scenario(client, scenario, size, repeat):
+    from django.db import connection
+    from benchmarks.scenarios import cleanup
+
+    latencies = []
+    queries = []
+    for _ in range(repeat):
+        method, url, payload = scenario(size)
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            start = time.perf_counter()
+            send(client, method, url, payload)
+            latencies.append(time.perf_counter() - start)
+        queries.append(counter.count)
+        cleanup()
+
+    # Memory is measured on a separate run, tracing slows requests down
+    method, url, payload = scenario(size)
+    tracemalloc.start()
+    send(client, method, url, payload)
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    cleanup()
+
+    p50 = percentile(latencies, 50)
+    return {
+        "scenario": scenario.__name__,
+        "size": size,
+        "repeat": repeat,
+        "p50": p50,
+        "p99": percentile(latencies, 99),
+        "throughput": size / p50,
+        "queries": percentile(queries, 50),
+        "peak_memory": peak_memory
+    }
+
+
+def metadata(database):
+    import django
+    import rest_framework
+    from django.db import connection
+
+    try:
+        commit = subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=BASE_DIR
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "commit": commit,
+        "date": datetime.datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "djangorestframework": rest_framework.VERSION,
+        "database": database,
+        "database_vendor": connection.vendor
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1, 100, 1000, 10000]
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--database", choices=["sqlite", "postgres"], default="sqlite"
+    )
+    parser.add_argument("--scenario", nargs="+", default=None)
+    parser.add_argument("--output", default="benchmark.json")
+    args = parser.parse_args(argv)
+
+    setup_django(args.database)
+
+    from rest_framework.test import APIClient
+    from benchmarks.scenarios import SCENARIOS
+
+    client = APIClient()
+    names = args.scenario or list(SCENARIOS)
+    results = []
+    for name in names:
+        for size in args.sizes:
+            result = run_scenario(client, SCENARIOS[name], size, args.repeat)
+            results.append(result)
+            print(
+                "%-28s %6d items  p50 %9.4fs  p99 %9.4fs  "
+                "%6d queries  %8.1f KiB" % (
+                    name, size, result["p50"], result["p99"],
+                    result["queries"], result["peak_memory"] / 1024.0
+                )
+            )
+
+    with open(args.output, "w") as f:
+        json.dump(
+            {"meta": metadata(args.database), "results": results},
+            f,
+            indent=2
+        )
+
+
+if __name__ == "__main__":
+    main()
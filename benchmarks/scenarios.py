@@ -0,0 +1,131 @@
+from collections import OrderedDict
+
+from django.urls import reverse
+from tests.testapp.models import Book, Course, Student, Phone
+
+
+def book_pks(size):
+    Book.objects.bulk_create([
+        Book(title="Book %d" % i, author="Author") for i in range(size)
+    ])
+    return list(Book.objects.order_by("pk").values_list("pk", flat=True))
+
+
+def course_with_books(size):
+    course = Course.objects.create(name="Course", code="CS100")
+    pks = book_pks(size)
+    course.books.add(*pks)
+    return course, pks
+
+
+def student_with_phones(size):
+    course = Course.objects.create(name="Course", code="CS100")
+    student = Student.objects.create(name="Student", age=20, course=course)
+    Phone.objects.bulk_create([
+        Phone(number="0767%05d" % i, type="Home", student=student)
+        for i in range(size)
+    ])
+    pks = list(
+        Phone.objects.filter(student=student)
+        .order_by("pk").values_list("pk", flat=True)
+    )
+    return student, pks
+
+
+def books_data(size):
+    return [{"title": "Book %d" % i, "author": "Author"} for i in range(size)]
+
+
+def phones_data(size):
+    return [
+        {"number": "0768%05d" % i, "type": "Office"} for i in range(size)
+    ]
+
+
+# Each scenario prepares the database for a payload of `size` nested
+# items and returns (method, url, payload) of the request to measure
+
+def post_course_create(size):
+    data = {"name": "Course", "code": "CS100"}
+    data["books"] = {"create": books_data(size)}
+    return "post", reverse("wcourse-list"), data
+
+
+def post_course_add(size):
+    data = {"name": "Course", "code": "CS100"}
+    data["books"] = {"add": book_pks(size)}
+    return "post", reverse("rcourse-list"), data
+
+
+def patch_course_add(size):
+    course = Course.objects.create(name="Course", code="CS100")
+    data = {"books": {"add": book_pks(size)}}
+    return "patch", reverse("rcourse-detail", args=[course.pk]), data
+
+
+def patch_course_create(size):
+    course = Course.objects.create(name="Course", code="CS100")
+    data = {"books": {"create": books_data(size)}}
+    return "patch", reverse("wcourse-detail", args=[course.pk]), data
+
+
+def patch_course_remove(size):
+    course, pks = course_with_books(size)
+    data = {"books": {"remove": pks}}
+    return "patch", reverse("rcourse-detail", args=[course.pk]), data
+
+
+def patch_course_update(size):
+    course, pks = course_with_books(size)
+    data = {"books": {"update": {
+        pk: {"title": "New Book %d" % pk, "author": "New Author"}
+        for pk in pks
+    }}}
+    return "patch", reverse("wcourse-detail", args=[course.pk]), data
+
+
+def post_student_phones_create(size):
+    data = {
+        "name": "Student",
+        "age": 20,
+        "course": {"name": "Course", "code": "CS100"},
+        "phone_numbers": {"create": phones_data(size)}
+    }
+    return "post", reverse("wstudent-list"), data
+
+
+def patch_student_phones_update(size):
+    student, pks = student_with_phones(size)
+    data = {"phone_numbers": {"update": {
+        pk: {"number": "0769%05d" % i, "type": "Office"}
+        for i, pk in enumerate(pks)
+    }}}
+    return "patch", reverse("wstudent-detail", args=[student.pk]), data
+
+
+def patch_student_phones_remove(size):
+    student, pks = student_with_phones(size)
+    data = {"phone_numbers": {"remove": pks}}
+    return "patch", reverse("wstudent-detail", args=[student.pk]), data
+
+
+SCENARIOS = OrderedDict(
+    (scenario.__name__, scenario) for scenario in [
+        post_course_create,
+        post_course_add,
+        patch_course_add,
+        patch_course_create,
+        patch_course_remove,
+        patch_course_update,
+        post_student_phones_create,
+        patch_student_phones_update,
+        patch_student_phones_remove,
+    ]
+)
+
+
+def cleanup():
+    Phone.objects.all().delete()
+    Student.objects.all().delete()
+    Course.objects.all().delete()
+    Book.objects.all().delete()
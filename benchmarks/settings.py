@@ -0,0 +1,18 @@
+import os
+
+from tests.settings import *  # noqa: F401,F403
+
+
+DEBUG = False
+
+if os.environ.get("BENCH_DATABASE") == "postgres":
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get("PGDATABASE", "drf_pretty_update"),
+            'USER': os.environ.get("PGUSER", "postgres"),
+            'PASSWORD': os.environ.get("PGPASSWORD", ""),
+            'HOST': os.environ.get("PGHOST", "localhost"),
+            'PORT': os.environ.get("PGPORT", "5432"),
+        }
+    }
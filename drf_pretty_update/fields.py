@@ -1,16 +1,30 @@
-import copy
+from itertools import islice
+
+from django.db import models, router
 from rest_framework.serializers import (
-    Serializer, ListSerializer, 
-    ValidationError, PrimaryKeyRelatedField
+    Serializer, ListSerializer, ALL_FIELDS,
+    ValidationError
 )
-from django.db.models.fields.related import ManyToOneRel
 
 from .exceptions import InvalidOperation
-from .operations import ADD, CREATE, REMOVE, UPDATE
+from .operations import ADD, CREATE, REMOVE, UPDATE, SET
+from .relations import MANY_TO_ONE, MANY_TO_MANY, get_relation
+from .utils import (
+    PK_CACHE, NOT_A_LIST, DOES_NOT_EXIST, fetch_pks, get_pk_cache,
+    prefetch_pks, resolve_pks
+)
+
 
+CREATE_SUPPORTED_OPERATIONS = (ADD, CREATE, SET)
+UPDATE_SUPPORTED_OPERATIONS = (ADD, CREATE, REMOVE, UPDATE, SET)
+
+# How "remove" deletes many to one related objects,
+# FAST_DELETE is an alias of DELETE
+DELETE = "delete"
+FAST_DELETE = "fast_delete"
+DETACH = "detach"
+REMOVE_STRATEGIES = (DELETE, FAST_DELETE, DETACH)
 
-CREATE_SUPPORTED_OPERATIONS = (ADD, CREATE)
-UPDATE_SUPPORTED_OPERATIONS = (ADD, CREATE, REMOVE, UPDATE)
 
 class _ReplaceableField(object):
     pass
@@ -18,13 +32,159 @@ class _ReplaceableField(object):
 class _WritableField(object):
     pass
 
+# Generated classes, shared by identical NestedField declarations
+_nested_classes_cache = {}
+
+def cached_nested_classes(key, build):
+    try:
+        classes = _nested_classes_cache.get(key)
+    except TypeError:
+        # Some option is unhashable, don't cache
+        return build()
+    if classes is None:
+        classes = _nested_classes_cache.setdefault(key, build())
+    return classes
+
+def serializer_class_without_field(serializer_class, field_name):
+    # Derive a serializer class which doesn't have field_name instead
+    # of altering Meta.fields of the shared serializer_class
+    def build():
+        meta = serializer_class.Meta
+        fields = getattr(meta, "fields", None)
+        if fields is not None and fields != ALL_FIELDS:
+            attrs = {"fields": [f for f in fields if f != field_name]}
+        else:
+            exclude = list(getattr(meta, "exclude", None) or [])
+            attrs = {"fields": None, "exclude": exclude + [field_name]}
+        return type(
+            serializer_class.__name__,
+            (serializer_class,),
+            {"Meta": type("Meta", (meta,), attrs)}
+        )
+
+    return cached_nested_classes(
+        ("without_field", serializer_class, field_name),
+        build
+    )
+
+
+def pk_queryset(serializer, model, pk_only=False):
+    # (queryset resolving pks of serializer's nested field, key of its
+    # pk cache), see the queryset & using options of
+    # BaseNestedFieldSerializerFactory. Querysets bound to an alias with
+    # .using() keep it unless the using option is set
+    options = serializer.nested_options
+    queryset = options["queryset"]
+    if queryset is None:
+        scope = "pk" if pk_only else None
+        queryset = model.objects.only("pk") if pk_only else model.objects
+    else:
+        scope = queryset
+        if callable(queryset):
+            queryset = queryset(serializer.context)
+    queryset = queryset.all()
+    if options["using"] is not None or queryset._db is None:
+        queryset = queryset.using(
+            pk_using(serializer, queryset.model, options["using"], pk_only)
+        )
+    return queryset, (queryset.model, scope, queryset.db)
+
+
+def pk_using(serializer, model, using, pk_only=False):
+    # Alias pks of a nested field are looked up on, the using option or
+    # the router's database for model with the closest instance up the
+    # serializer tree as hint, so nested pks of an instance are looked
+    # up on its database. Pk only lookups just check rows exist so they
+    # may go to a replica, whole objs are written back & diffed against
+    # so they are read from the write database. Serializers validating
+    # nested data are built unbound, their nested_parent is the field
+    # they validate for
+    if using is not None:
+        return using
+    hints = {}
+    parent = serializer.parent
+    while parent is not None:
+        instance = getattr(parent, "instance", None)
+        if isinstance(instance, models.Model) and instance._state.db:
+            hints["instance"] = instance
+            break
+        parent = getattr(parent, "nested_parent", None) or parent.parent
+    if pk_only:
+        return router.db_for_read(model, **hints)
+    return router.db_for_write(model, **hints)
+
+
+def nested_context(context):
+    # Context of serializers validating nested data, they share the
+    # request & its pk cache with the serializer they validate for
+    return {
+        "request": context.get("request"),
+        PK_CACHE: context.setdefault(PK_CACHE, {})
+    }
+
+
+def count_errors(errors):
+    # errors format {operation: [error] or {index or pk: error}}
+    return sum(len(operation_errors) for operation_errors in errors.values())
+
+
+def truncate_errors(errors, max_errors):
+    if isinstance(errors, dict):
+        return dict(islice(errors.items(), max_errors))
+    if isinstance(errors, list):
+        return errors[:max_errors]
+    return errors
+
+
 def BaseNestedFieldSerializerFactory(*args, 
                                      accept_pk=False, 
-                                     create_ops=[ADD, CREATE], 
-                                     update_ops=[ADD, CREATE, REMOVE, UPDATE],
+                                     create_ops=[ADD, CREATE, SET], 
+                                     update_ops=[
+                                         ADD, CREATE, REMOVE, UPDATE, SET
+                                     ],
                                      serializer_class=None, 
+                                     bulk_create=False,
+                                     bulk_update=False,
+                                     batch_size=None,
+                                     savepoint=False,
+                                     remove_strategy=DELETE,
+                                     chunk_size=None,
+                                     max_errors=None,
+                                     queryset=None,
+                                     using=None,
                                      **kwargs):
-    BaseClass = _ReplaceableField if accept_pk else _WritableField
+    # bulk_create=True inserts "create" lists with Model.objects.bulk_create
+    # and bulk_update=True writes "update" dicts with QuerySet.bulk_update,
+    # both in batches of batch_size, model save() and its signals are skipped.
+    # savepoint=True writes the field in its own savepoint of the
+    # transaction wrapping the parent's create/update.
+    # remove_strategy applies to "remove" on many to one relations,
+    # "delete" uses QuerySet.delete(), which already skips loading rows
+    # when there are no cascades or signals to handle, "fast_delete" is
+    # kept as an alias of "delete" and "detach" sets the foreign key to
+    # null with one UPDATE.
+    # chunk_size=N validates & writes "create" lists N items at a time
+    # while the parent is saved, so invalid items are reported by save().
+    # max_errors=N validates all operations instead of stopping at the
+    # first invalid one and reports up to N errors keyed by operation
+    # and item index ("create") or pk ("update").
+    # queryset (or a callable taking the serializer context and
+    # returning one) resolves pks of pk operations & accept_pk values,
+    # by default "add", "remove" & "set" pks are checked on the pk
+    # column only and "update" & accept_pk pks load whole objects.
+    # using=alias reads pks from & writes nested objects to that
+    # database instead of the parent's one.
+    options = {
+        "bulk_create": bulk_create,
+        "bulk_update": bulk_update,
+        "batch_size": batch_size,
+        "savepoint": savepoint,
+        "remove_strategy": remove_strategy,
+        "chunk_size": chunk_size,
+        "max_errors": max_errors,
+        "queryset": queryset,
+        "using": using
+    }
     
     if not set(create_ops).issubset(set(CREATE_SUPPORTED_OPERATIONS)):
         msg = (
@@ -40,64 +200,228 @@ def BaseNestedFieldSerializerFactory(*args,
         )
         raise InvalidOperation(msg)
 
+    if remove_strategy not in REMOVE_STRATEGIES:
+        msg = (
+            "Invalid remove strategy, Supported strategies are " +
+            ", ".join(REMOVE_STRATEGIES)
+        )
+        raise InvalidOperation(msg)
+
+    key = (
+        serializer_class, accept_pk, tuple(create_ops), tuple(update_ops),
+        tuple(sorted(options.items()))
+    )
+    classes = cached_nested_classes(
+        key,
+        lambda: BaseNestedFieldClasses(
+            serializer_class,
+            accept_pk, 
+            create_ops, 
+            update_ops, 
+            options
+        )
+    )
+
+    kwargs.update({"read_only": False, "write_only": False})
+    return {
+        "serializer_class": classes["serializer_class"],
+        "list_serializer_class": classes["list_serializer_class"],
+        "args": args,
+        "kwargs": kwargs
+    }
+
+
+def BaseNestedFieldClasses(serializer_class, accept_pk, 
+                           create_ops, update_ops, options):
+    BaseClass = _ReplaceableField if accept_pk else _WritableField
+
     class BaseNestedFieldListSerializer(ListSerializer, BaseClass):
-        def validate_pk_list(self, pks):
-            queryset = self.child.Meta.model.objects.all()
-            validator = PrimaryKeyRelatedField(
-                queryset=queryset, 
-                many=True 
+        nested_options = options
+
+        def get_pk_queryset(self, pk_only=False):
+            return pk_queryset(self, self.child.Meta.model, pk_only)
+
+        def get_pk_list_cache(self, key, pk_only):
+            cache = get_pk_cache(self.context, key)
+            if pk_only:
+                # Whole objs of the same rows prove their pks exist too
+                full_key = self.get_pk_queryset()[1]
+                if full_key != key:
+                    cache.update(get_pk_cache(self.context, full_key))
+            return cache
+
+        def validate_pk_list(self, pks, pk_only=False):
+            queryset, key = self.get_pk_queryset(pk_only)
+            return resolve_pks(
+                queryset,
+                pks,
+                self.get_pk_list_cache(key, pk_only)
             )
-            return validator.run_validation(pks)
     
-        def validate_data_list(self, data):
-            request = self.context.get('request')
-            model = self.parent.Meta.model
-            rel = getattr(model, self.source).rel
+        def get_data_list_serializer(self, data):
+            relation = get_relation(self.parent.Meta.model, self.source)
 
-            if isinstance(rel, ManyToOneRel):
+            if relation["type"] == MANY_TO_ONE:
                 # ManyToOne Relation
-                field_name = getattr(model, self.source).field.name
-                # remove field_name to validated fields
-                contain_field = lambda a: a != field_name
-                fields = filter(contain_field, serializer_class.Meta.fields)
-                original_fields = copy.copy(serializer_class.Meta.fields)
-                serializer_class.Meta.fields = list(fields)
-                parent_serializer = serializer_class(
-                    data=data, 
-                    many=True, 
-                    context={"request": request}
+                # Validate with a serializer without the foreign key
+                SerializerClass = serializer_class_without_field(
+                    serializer_class,
+                    relation["foreignkey"]
                 )
-                parent_serializer.is_valid(raise_exception=True)
-                serializer_class.Meta.fields = original_fields
             else:
                 # ManyToMany Relation
-                parent_serializer = serializer_class(
-                    data=data, 
-                    many=True, 
-                    context={"request": request}
-                )
-                parent_serializer.is_valid(raise_exception=True)
+                SerializerClass = serializer_class
+            parent_serializer = SerializerClass(
+                data=data, 
+                many=True, 
+                context=nested_context(self.context)
+            )
+            parent_serializer.nested_parent = self
+            return parent_serializer
+
+        def validate_data_list(self, data):
+            parent_serializer = self.get_data_list_serializer(data)
+            parent_serializer.is_valid(raise_exception=True)
             return parent_serializer.validated_data
+
+        def validate_data_chunks(self, data):
+            # Yield validated chunks of data as they are consumed,
+            # errors are keyed by the item's index in data
+            chunk_size = options["chunk_size"]
+            for start in range(0, len(data), chunk_size):
+                chunk = data[start:start + chunk_size]
+                parent_serializer = self.get_data_list_serializer(chunk)
+                if not parent_serializer.is_valid():
+                    raise ValidationError({
+                        start + index: errors
+                        for index, errors in
+                        enumerate(parent_serializer.errors) if errors
+                    })
+                yield parent_serializer.validated_data
     
         def validate_add_list(self, data):
-            return self.validate_pk_list(data)
+            return self.validate_pk_list(data, pk_only=True)
 
         def validate_create_list(self, data):
-            return self.validate_data_list(data)
+            if not options["chunk_size"]:
+                return self.validate_data_list(data)
+            if not isinstance(data, list):
+                raise ValidationError(
+                    NOT_A_LIST.format(input_type=type(data).__name__)
+                )
+            return self.validate_data_chunks(data)
     
         def validate_remove_list(self, data):
-            return self.validate_pk_list(data)
+            return self.validate_pk_list(data, pk_only=True)
+
+        def validate_set_list(self, data):
+            relation = get_relation(self.parent.Meta.model, self.source)
+            if relation["type"] != MANY_TO_MANY:
+                raise ValidationError(
+                    "'set' operation is supported on many to many "
+                    "relations only"
+                )
+            return self.validate_pk_list(data, pk_only=True)
     
         def validate_update_list(self, data):
             # Obtain pks & data then
             if isinstance(data, dict):
-                self.validate_pk_list(data.keys())
-                self.validate_data_list(list(data.values()))
+                objs = self.validate_pk_list(data.keys())
+                values = self.validate_data_list(list(data.values()))
+                # [(obj, {sub_field: value})]
+                return list(zip(objs, values))
             else:
                 raise ValidationError(
                     "Expected data of form {'pk': 'data'..}"
                 )
 
+        def collect_create_errors(self, data, max_errors):
+            # Like validate_create_list with errors keyed by item index
+            parent_serializer = self.get_data_list_serializer(data)
+            if parent_serializer.is_valid():
+                return parent_serializer.validated_data
+            errors = parent_serializer.errors
+            if isinstance(errors, list):
+                errors = {
+                    index: item_errors
+                    for index, item_errors in enumerate(errors)
+                    if item_errors
+                }
+            raise ValidationError(truncate_errors(errors, max_errors))
+
+        def collect_update_errors(self, data, max_errors):
+            # Like validate_update_list with errors keyed by pk,
+            # unknown pks & invalid data are reported together
+            if not isinstance(data, dict):
+                raise ValidationError(
+                    "Expected data of form {'pk': 'data'..}"
+                )
+            queryset, key = self.get_pk_queryset()
+            pks, normalized_pks, objs = fetch_pks(
+                queryset,
+                data.keys(),
+                get_pk_cache(self.context, key)
+            )
+            parent_serializer = self.get_data_list_serializer(
+                list(data.values())
+            )
+            if parent_serializer.is_valid():
+                item_errors = [None] * len(pks)
+            else:
+                item_errors = parent_serializer.errors
+
+            errors = {}
+            for pk, normalized_pk, errors_of_pk in zip(
+                    pks, normalized_pks, item_errors):
+                if len(errors) >= max_errors:
+                    break
+                if normalized_pk not in objs:
+                    errors[pk] = [DOES_NOT_EXIST.format(pk_value=pk)]
+                elif errors_of_pk:
+                    errors[pk] = errors_of_pk
+            if errors:
+                raise ValidationError(errors)
+            return [
+                (objs[pk], values) for pk, values in
+                zip(normalized_pks, parent_serializer.validated_data)
+            ]
+
+        def validate_operations(self, data, validate):
+            # data format {operation: values}, validation stops at the
+            # first invalid operation unless max_errors is set
+            max_errors = options["max_errors"]
+            if max_errors is None:
+                return {
+                    operation: validate[operation](values)
+                    for operation, values in data.items()
+                }
+
+            collect = {UPDATE: self.collect_update_errors}
+            if not options["chunk_size"]:
+                collect[CREATE] = self.collect_create_errors
+
+            validated_data = {}
+            errors = {}
+            for operation, values in data.items():
+                remaining = max_errors - count_errors(errors)
+                if remaining <= 0:
+                    break
+                try:
+                    if operation in collect:
+                        validated_data[operation] = collect[operation](
+                            values,
+                            remaining
+                        )
+                    else:
+                        validated_data[operation] = validate[operation](
+                            values
+                        )
+                except ValidationError as e:
+                    errors[operation] = truncate_errors(e.detail, remaining)
+            if errors:
+                raise ValidationError(errors)
+            return validated_data
+
         def create_data_is_valid(self, data):
             if (isinstance(data, dict) and 
                     set(data.keys()).issubset(create_ops)):
@@ -108,12 +432,11 @@ def BaseNestedFieldSerializerFactory(*args,
             validate = {
                 ADD: self.validate_add_list,
                 CREATE: self.validate_create_list, 
+                SET: self.validate_set_list,
             }
 
             if self.create_data_is_valid(data):
-                for operation, values in data.items():
-                    validate[operation](values)
-                return data
+                return self.validate_operations(data, validate)
             else:
                 wrap_quotes = lambda op: "'" + op + "'"
                 op_list =list(map(wrap_quotes, create_ops))
@@ -135,12 +458,20 @@ def BaseNestedFieldSerializerFactory(*args,
                 CREATE: self.validate_create_list, 
                 REMOVE: self.validate_remove_list, 
                 UPDATE: self.validate_update_list,
+                SET: self.validate_set_list,
             }
 
             if self.update_data_is_valid(data):
-                for operation, values in data.items():
-                    validate[operation](values)
-                return data
+                if isinstance(data.get(UPDATE), dict):
+                    # "update" loads whole objs, pks of the other
+                    # operations are found among them
+                    queryset, key = self.get_pk_queryset()
+                    prefetch_pks(
+                        queryset,
+                        data[UPDATE],
+                        get_pk_cache(self.context, key)
+                    )
+                return self.validate_operations(data, validate)
             else:
                 wrap_quotes = lambda op: "'" + op + "'"
                 op_list =list(map(wrap_quotes, update_ops))
@@ -152,7 +483,7 @@ def BaseNestedFieldSerializerFactory(*args,
 
         def to_internal_value(self, data):
             request = self.context.get('request')
-            context={"request": request}
+            context = nested_context(self.context)
             if  request.method in ["PUT", "PATCH"]:
                 return self.data_for_update(data)
 
@@ -177,19 +508,24 @@ def BaseNestedFieldSerializerFactory(*args,
         class Meta(serializer_class.Meta):
             list_serializer_class = BaseNestedFieldListSerializer
 
+        nested_options = options
+
+        def get_pk_queryset(self):
+            return pk_queryset(self, self.Meta.model)
+
         def validate_pk_based_nested(self, data):
-            queryset = self.Meta.model.objects.all()
-            validator = PrimaryKeyRelatedField(
-                queryset=queryset,
-                many=False
+            queryset, key = self.get_pk_queryset()
+            objs = resolve_pks(
+                queryset,
+                [data],
+                get_pk_cache(self.context, key)
             )
-            obj = validator.run_validation(data)
-            return data
+            return objs[0]
 
         def validate_data_based_nested(self, data):
-            request = self.context.get("request")
-            context={"request": request}
+            context = nested_context(self.context)
             parent_serializer = serializer_class(data=data, context=context)
+            parent_serializer.nested_parent = self
             parent_serializer.is_valid(raise_exception=True)
             return parent_serializer.validated_data
 
@@ -204,20 +540,25 @@ def BaseNestedFieldSerializerFactory(*args,
                 (serializer_class.__name__, )
             )
 
-    kwargs.update({"read_only": False, "write_only": False})
     return {
         "serializer_class": BaseNestedFieldSerializer,
-        "list_serializer_class": BaseNestedFieldListSerializer,
-        "args": args,
-        "kwargs": kwargs
+        "list_serializer_class": BaseNestedFieldListSerializer
     }
 
 
-
 def NestedFieldWraper(*args, **kwargs):
     factory = BaseNestedFieldSerializerFactory(*args, **kwargs)
-    serializer_class = kwargs["serializer_class"]
+    NestedSerializer = cached_nested_classes(
+        factory["serializer_class"],
+        lambda: NestedFieldClass(kwargs["serializer_class"], factory)
+    )
+    return NestedSerializer(
+        *factory["args"],
+        **factory["kwargs"]
+    )
+
 
+def NestedFieldClass(serializer_class, factory):
     class NestedListSerializer(factory["list_serializer_class"]):
         def __repr__(self):
             return (
@@ -236,11 +577,7 @@ def NestedFieldWraper(*args, **kwargs):
                 (serializer_class.__name__, )
             )
 
-            
-    return NestedSerializer(
-        *factory["args"],
-        **factory["kwargs"]
-    )
+    return NestedSerializer
 
 def NestedField(serializer_class, *args, **kwargs):
     return NestedFieldWraper(
@@ -0,0 +1,131 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.db import connections, router
+from django.dispatch import Signal
+
+
+# Sent after every measured nested write with
+# field, operation, queries, db_time, wall_time, depth & rows arguments,
+# sender is the serializer class doing the write, rows is the number of
+# rows written by "update" (None for other operations)
+nested_write_measured = Signal()
+
+_local = threading.local()
+
+
+class NestedWriteMetrics(object):
+    """ Measurements collected by track_nested_writes """
+    def __init__(self):
+        self.records = []
+
+    def add(self, record):
+        self.records.append(record)
+
+    def summary(self):
+        # {(field, operation): {queries: n, db_time: s, wall_time: s}},
+        # writes of deeper nested fields are included in their parent's
+        # figures so they are reported separately under their own key
+        summary = OrderedDict()
+        for record in self.records:
+            key = (record["field"], record["operation"])
+            totals = summary.setdefault(
+                key,
+                {"queries": 0, "db_time": 0.0, "wall_time": 0.0}
+            )
+            for name in totals:
+                totals[name] += record[name]
+        return summary
+
+
+@contextmanager
+def track_nested_writes():
+    # Collect measurements of nested writes done in this thread
+    metrics = NestedWriteMetrics()
+    trackers = _local.__dict__.setdefault("trackers", [])
+    trackers.append(metrics)
+    try:
+        yield metrics
+    finally:
+        trackers.remove(metrics)
+
+
+class _NoMeasurement(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+no_measurement = _NoMeasurement()
+
+
+def is_measuring():
+    # Whether some tracker or receiver wants nested writes measured
+    return bool(
+        getattr(_local, "trackers", None) or
+        nested_write_measured.receivers
+    )
+
+
+class _Measurement(object):
+    def __init__(self, sender, field, operation, using, rows, trackers):
+        # Writes go to the sender model's write database by default
+        if using is None:
+            using = router.db_for_write(sender.Meta.model)
+        self.sender = sender
+        self.field = field
+        self.operation = operation
+        self.using = using
+        self.rows = rows
+        self.trackers = trackers
+        self.queries = 0
+        self.db_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - start
+
+    def __enter__(self):
+        self.depth = getattr(_local, "depth", 0)
+        _local.depth = self.depth + 1
+        self.wrapper = connections[self.using].execute_wrapper(self)
+        self.wrapper.__enter__()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        wall_time = time.perf_counter() - self.start
+        self.wrapper.__exit__(*exc_info)
+        _local.depth = self.depth
+        record = {
+            "field": self.field,
+            "operation": self.operation,
+            "queries": self.queries,
+            "db_time": self.db_time,
+            "wall_time": wall_time,
+            "depth": self.depth,
+            "rows": self.rows() if self.rows else None
+        }
+        for metrics in self.trackers:
+            metrics.add(record)
+        nested_write_measured.send(sender=self.sender, **record)
+        return False
+
+
+def measure_nested_write(sender, field, operation, using=None, rows=None):
+    # Nothing is measured unless someone is listening,
+    # rows is a callable returning the number of rows written
+    if not is_measuring():
+        return no_measurement
+    return _Measurement(
+        sender, field, operation, using, rows,
+        list(getattr(_local, "trackers", None) or [])
+    )
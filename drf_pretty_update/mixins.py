@@ -1,50 +1,433 @@
-import copy
+import threading
+from contextlib import contextmanager
 
 from rest_framework.serializers import (
-    Serializer, ListSerializer, 
-    ValidationError
+    ListSerializer, ValidationError, raise_errors_on_nested_writes
 )
-from django.db.models.fields.related import ManyToOneRel, ManyToManyRel
+from rest_framework.utils import model_meta
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.db import router, transaction
+from django.db.models import Model, prefetch_related_objects, signals
 
-from .operations import ADD, CREATE, REMOVE, UPDATE
-from .fields import _ReplaceableField, _WritableField
+from .operations import ADD, CREATE, REMOVE, UPDATE, SET
+from .exceptions import InvalidOperation
+from .fields import _ReplaceableField, _WritableField, DETACH
+from .planner import NestedWritePlanner
+from .relations import FOREIGNKEY, MANY_TO_ONE, MANY_TO_MANY, get_relation
+from .instrumentation import (
+    is_measuring, measure_nested_write, no_measurement,
+    nested_write_measured, track_nested_writes
+)
+from .utils import (
+    DOES_NOT_EXIST, chunked, get_chunk_size, 
+    can_return_pks_from_bulk_insert, bulk_link, bulk_set
+)
+
+
+try:
+    from asgiref.sync import sync_to_async
+except ImportError:
+    # asgiref is installed with Django 3.0+
+    sync_to_async = None
+
+
+_atomic_state = threading.local()
+
+
+@contextmanager
+def nested_atomic(using):
+    # The outermost nested write is a savepoint if it runs inside another
+    # transaction, writes of nested serializers just join its transaction
+    depths = _atomic_state.__dict__.setdefault("depths", {})
+    depth = depths.get(using, 0)
+    with transaction.atomic(using=using, savepoint=depth == 0):
+        depths[using] = depth + 1
+        try:
+            yield
+        finally:
+            depths[using] = depth
+
+
+def to_async(func):
+    # Django binds a transaction to the connection of the thread which
+    # opened it, so a nested write runs as a whole in a sync thread and
+    # the event loop is free while it runs
+    if sync_to_async is None:
+        raise ImproperlyConfigured(
+            "Async nested writes require asgiref, "
+            "install it with `pip install asgiref`"
+        )
+    return sync_to_async(func)
+
+
+def in_nested_write(using):
+    # Whether a nested_atomic block is open on using in this thread
+    return bool(getattr(_atomic_state, "depths", {}).get(using))
+
+
+class BaseNestedMixin(object):
+    """ Base Mixin """
+    # A list collecting many to many "add" & "set" links of new
+    # instances as (manager, relation_info, objs, using) instead of writing
+    # them, set by NestedListSerializer to link all instances at once
+    deferred_links = None
+    # Database alias to write to, set by the parent serializer on the
+    # nested serializers it writes with so a nested write stays on one
+    # connection, the router's write database by default
+    nested_using = None
+    # Alias of the running create/update
+    write_using = None
+
+    @classmethod
+    def get_nested_write_plan(cls):
+        # Nested fields are classified once per serializer class,
+        # subclasses get their own plan
+        plan = cls.__dict__.get("_nested_write_plan")
+        if plan is None:
+            plan = cls.build_nested_write_plan()
+            cls._nested_write_plan = plan
+        return plan
+
+    @classmethod
+    def build_nested_write_plan(cls):
+        # plan format {field: {
+        # kind: replaceable|writable,
+        # relation: foreignkey|many_to_one|many_to_many,
+        # foreignkey: name, (many_to_one only)
+        # relation_info: see drf_pretty_update.relations,
+        # model: nested model,
+        # serializer_class: nested serializer class,
+        # options: NestedField options
+        # }}
+        model = cls.Meta.model
+        plan = {}
+        for field, field_serializer in cls._declared_fields.items():
+            if isinstance(field_serializer, _ReplaceableField):
+                kind = "replaceable"
+            elif isinstance(field_serializer, _WritableField):
+                kind = "writable"
+            else:
+                continue
+
+            relation_info = get_relation(model, field)
+            relation = relation_info["type"]
+            foreignkey = None
+            if isinstance(field_serializer, ListSerializer):
+                child = field_serializer.child
+                if relation == MANY_TO_ONE:
+                    foreignkey = relation_info["foreignkey"]
+                    options = field_serializer.nested_options
+                    if (options["remove_strategy"] == DETACH and
+                            not relation_info["null"]):
+                        msg = (
+                            f"Can't use {DETACH} remove strategy on "
+                            f"{field} field, {foreignkey} is not nullable"
+                        )
+                        raise InvalidOperation(msg)
+                elif relation != MANY_TO_MANY:
+                    continue
+            else:
+                child = field_serializer
+                relation = FOREIGNKEY
+
+            plan[field] = {
+                "kind": kind,
+                "relation": relation,
+                "foreignkey": foreignkey,
+                "relation_info": relation_info,
+                "model": child.Meta.model,
+                "serializer_class": type(child),
+                "options": field_serializer.nested_options
+            }
+        return plan
+
+    @classmethod
+    def get_read_back_lookups(cls):
+        # prefetch_related lookups for nested fields & their own nested
+        # fields, so rendering the written instance costs one query
+        # per nested field
+        lookups = cls.__dict__.get("_read_back_lookups")
+        if lookups is None:
+            lookups = []
+            for field, field_plan in cls.get_nested_write_plan().items():
+                lookups.append(field)
+                SerializerClass = field_plan["serializer_class"]
+                if hasattr(SerializerClass, "get_read_back_lookups"):
+                    lookups.extend(
+                        field + "__" + lookup
+                        for lookup in SerializerClass.get_read_back_lookups()
+                    )
+            cls._read_back_lookups = lookups
+        return lookups
+
+    def drop_written(self, instance):
+        # Drop relations cached before the write, they are stale
+        cache = getattr(instance, "_prefetched_objects_cache", {})
+        for field in self.get_nested_write_plan():
+            cache.pop(field, None)
+        return instance
+
+    def prefetch_written(self, instance, using):
+        # Load written relations back, parents load back their nested
+        # instances with their lookups
+        if in_nested_write(using):
+            return instance
+        self.drop_written(instance)
+        prefetch_related_objects([instance], *self.get_read_back_lookups())
+        return instance
+
+    def split_nested_fields(self, validated_data):
+        # Pop nested fields out of validated_data and group them
+        fields = {
+            "foreignkey_related": { 
+                "replaceable": {},
+                "writable": {}
+            }, 
+            "many_to": {
+                "many_related": {},
+                "one_related": {}
+            }
+        }
+
+        plan = self.get_nested_write_plan()
+        for field in list(validated_data):
+            if field not in plan:
+                continue
+            field_plan = plan[field]
+            value = validated_data.pop(field)
+            if field_plan["relation"] == FOREIGNKEY:
+                fields["foreignkey_related"][field_plan["kind"]] \
+                    .update({field: value})
+            elif field_plan["relation"] == MANY_TO_ONE:
+                fields["many_to"]["one_related"].update({field: value})
+            else:
+                fields["many_to"]["many_related"].update({field: value})
+        return fields
+
+    def measure_write(self, field, operation):
+        # See drf_pretty_update.instrumentation, nothing is set up
+        # unless someone is listening
+        if not is_measuring():
+            return no_measurement
+        rows = None
+        if operation == UPDATE:
+            rows = lambda: self.nested_rows_written.get(field, 0)
+        return measure_nested_write(
+            type(self),
+            field,
+            operation,
+            using=self.get_field_using(field),
+            rows=rows
+        )
+
+    def count_written_rows(self, field, rows):
+        # nested_rows_written format {field: rows written by "update"}
+        written = self.__dict__.setdefault("nested_rows_written", {})
+        written[field] = written.get(field, 0) + rows
 
+    def get_nested_options(self, field):
+        return self.get_nested_write_plan()[field]["options"]
 
-class NestedCreateMixin(object):
+    def get_relation_info(self, field):
+        return self.get_nested_write_plan()[field]["relation_info"]
+
+    def get_write_using(self, instance=None):
+        # The parent's alias for nested serializers, else the router's
+        # write database with instance as hint, which is the database
+        # instance was loaded from unless a router says otherwise
+        if self.nested_using is not None:
+            return self.nested_using
+        return router.db_for_write(self.Meta.model, instance=instance)
+
+    def get_field_using(self, field):
+        # Nested objects of field are written to its using option or
+        # to the alias of the parent
+        return self.get_nested_options(field)["using"] or self.write_using
+
+    def get_nested_serializer(self, field, instance=None):
+        # Serializer writing field's nested objects to its alias
+        request = self.context.get("request")
+        context={"request": request}
+        field_plan = self.get_nested_write_plan()[field]
+        SerializerClass = field_plan["serializer_class"]
+        serializer = SerializerClass(instance, context=context)
+        serializer.nested_using = self.get_field_using(field)
+        return serializer
+
+    def nested_field_atomic(self, field):
+        # Fields declared with savepoint=True are written in a savepoint
+        savepoint = self.get_nested_options(field)["savepoint"]
+        return transaction.atomic(
+            using=self.get_field_using(field),
+            savepoint=savepoint
+        )
+
+    def iter_create_chunks(self, field, data):
+        # Fields with a chunk_size validate "create" lists while they
+        # are written, one validated chunk at a time
+        if not self.get_nested_options(field)["chunk_size"]:
+            yield data
+            return
+        try:
+            for chunk in data:
+                yield chunk
+        except ValidationError as e:
+            raise ValidationError({field: e.detail})
+
+    def get_nested_fields(self, serializer):
+        # Fields which can't be written in bulk
+        info = model_meta.get_field_info(serializer.Meta.model)
+        return {
+            name for name, field in serializer.fields.items()
+            if isinstance(field, (_ReplaceableField, _WritableField)) or
+            (name in info.relations and info.relations[name].to_many)
+        }
+
+    def bulk_create_related(self, field, data, related=None, need_pks=False):
+        # Validate the whole list at once then insert it with
+        # Model.objects.bulk_create, model save() & signals are skipped
+        related = related or {}
+        field_plan = self.get_nested_write_plan()[field]
+        batch_size = field_plan["options"]["batch_size"]
+        model = field_plan["model"]
+        field_serializer = self.fields[field]
+        nested_fields = self.get_nested_fields(field_serializer.child)
+
+        # Some backends can't set pks of objs created in bulk
+        using = self.get_field_using(field)
+        save_each = need_pks and not can_return_pks_from_bulk_insert(using)
+
+        objs = []
+        pending_objs = []
+        for attrs in data:
+            attrs = {**attrs, **related}
+            if nested_fields.intersection(attrs):
+                # Nested & many to many values are saved by the serializer
+                serializer = self.get_nested_serializer(field)
+                objs.append(serializer.create(attrs))
+                continue
+            obj = model(**attrs)
+            if save_each:
+                obj.save(force_insert=True, using=using)
+            else:
+                pending_objs.append(obj)
+            objs.append(obj)
+
+        model._default_manager.db_manager(using).bulk_create(
+            pending_objs,
+            batch_size=batch_size
+        )
+        return objs
+
+    def get_changed_fields(self, instance, attrs):
+        # Names of instance's concrete fields whose values attrs change,
+        # None if some attr isn't a concrete field so changes are unknown
+        opts = instance._meta
+        changed = set()
+        for attr, value in attrs.items():
+            try:
+                field = opts.get_field(attr)
+            except FieldDoesNotExist:
+                return None
+            if not field.concrete:
+                return None
+            current = getattr(instance, field.attname)
+            if field.is_relation and value is not None:
+                value = getattr(value, field.target_field.attname)
+            if current != value:
+                changed.add(field.name)
+        return changed
+
+    def update_related_objs(self, field, data):
+        # data format [(obj, {sub_field: value})], objs are updated by
+        # their serializer unless values don't change anything
+        nested_fields = self.get_nested_fields(self.fields[field].child)
+
+        objs = []
+        rows = 0
+        for obj, values in data:
+            if (not nested_fields.intersection(values) and
+                    self.get_changed_fields(obj, values) == set()):
+                objs.append(obj)
+                continue
+            serializer = self.get_nested_serializer(field, obj)
+            # values are already validated
+            obj = serializer.update(obj, values)
+            objs.append(obj)
+            rows += 1
+        self.count_written_rows(field, rows)
+        return objs
+
+    def bulk_update_related(self, field, data):
+        # data format [(obj, {sub_field: value})], objs are loaded
+        # on validation so values are applied in memory and written
+        # with QuerySet.bulk_update, model save() & signals are skipped
+        field_plan = self.get_nested_write_plan()[field]
+        batch_size = field_plan["options"]["batch_size"]
+        model = field_plan["model"]
+        field_serializer = self.fields[field]
+        nested_fields = self.get_nested_fields(field_serializer.child)
+
+        objs = [obj for obj, attrs in data]
+        pending_objs = []
+        update_fields = set()
+        rows = 0
+        for obj, attrs in data:
+            if nested_fields.intersection(attrs):
+                # Nested & many to many values are saved by the serializer
+                serializer = self.get_nested_serializer(field, obj)
+                serializer.update(obj, attrs)
+                rows += 1
+                continue
+            changed = self.get_changed_fields(obj, attrs)
+            if changed is None:
+                changed = set(attrs)
+            elif not changed:
+                # Nothing to write for this obj
+                continue
+            for attr, value in attrs.items():
+                setattr(obj, attr, value)
+            update_fields.update(changed)
+            pending_objs.append(obj)
+
+        self.count_written_rows(field, rows + len(pending_objs))
+        if pending_objs:
+            using = self.get_field_using(field)
+            model._default_manager.db_manager(using).bulk_update(
+                pending_objs,
+                sorted(update_fields),
+                batch_size=batch_size
+            )
+        return objs
+
+
+class NestedCreateMixin(BaseNestedMixin):
     """ Create Mixin """
+    # True creates the whole nested tree with one insert per model
+    # & depth, see drf_pretty_update.planner
+    plan_deep_writes = False
+
     def create_replaceable_foreignkey_related(self, data):
-        # data format {field: pk}
-        objs = {}
-        for field, pk in data.items():
-            model = self.get_fields()[field].Meta.model
-            obj = model.objects.get(pk=pk)
-            objs.update({field: obj})
-        return objs
+        # data format {field: obj}, objs are resolved on validation
+        return dict(data)
 
     def create_writable_foreignkey_related(self, data):
         # data format {field: {sub_field: value}}
-        request = self.context.get("request")
-        context={"request": request}
         objs = {}
         for field, value in data.items():
-            # Get serializer class for nested field
-            SerializerClass = type(self.get_fields()[field])
-            serializer = SerializerClass(data=value, context=context)
-            serializer.is_valid()
-            obj = serializer.save()
+            serializer = self.get_nested_serializer(field)
+            # value is already validated
+            with self.measure_write(field, CREATE):
+                obj = serializer.create(value)
             objs.update({field: obj})
         return objs
 
     def bulk_create_objs(self, field, data):
-        request = self.context.get("request")
-        context={"request": request}
-        model = self.get_fields()[field].child.Meta.model
-        SerializerClass = type(self.get_fields()[field].child)
         pks = []
         for values in data:
-            serializer = SerializerClass(data=values, context=context)
-            serializer.is_valid()
-            obj = serializer.save()
+            serializer = self.get_nested_serializer(field)
+            # values are already validated
+            obj = serializer.create(values)
             pks.append(obj.pk)
         return pks
 
@@ -52,354 +435,503 @@ class NestedCreateMixin(object):
         # data format {field: {
         # foreignkey_name: name,
         # data: {
-        # ADD: [pks], 
+        # ADD: [objs], 
         # CREATE: [{sub_field: value}]
         # }}
         field_pks = {}
         for field, values in data.items():
-            model = self.Meta.model
-            foreignkey = getattr(model, field).field.name
+            foreignkey = self.get_nested_write_plan()[field]["foreignkey"]
             for operation in values:
-                if operation == ADD:
-                    pks = values[operation]
-                    model = self.get_fields()[field].child.Meta.model
-                    qs = model.objects.filter(pk__in=pks)
-                    qs.update(**{foreignkey: instance.pk})
-                    field_pks.update({field: pks})
-                elif operation == CREATE:
-                    for v in values[operation]:
-                        v.update({foreignkey: instance.pk})
-                    pks = self.bulk_create_objs(field, values[operation])
-                    field_pks.update({field: pks})
+                with self.measure_write(field, operation):
+                    if operation == ADD:
+                        pks = [obj.pk for obj in values[operation]]
+                        model = self.get_nested_write_plan()[field]["model"]
+                        qs = model._default_manager.using(
+                            self.get_field_using(field)
+                        ).filter(pk__in=pks)
+                        qs.update(**{foreignkey: instance.pk})
+                        field_pks.update({field: pks})
+                    elif operation == CREATE:
+                        options = self.get_nested_options(field)
+                        pks = []
+                        for chunk in self.iter_create_chunks(
+                                field, values[operation]):
+                            if options["bulk_create"]:
+                                objs = self.bulk_create_related(
+                                    field,
+                                    chunk,
+                                    related={foreignkey: instance}
+                                )
+                                pks.extend(obj.pk for obj in objs)
+                            else:
+                                for v in chunk:
+                                    v.update({foreignkey: instance})
+                                pks.extend(
+                                    self.bulk_create_objs(field, chunk)
+                                )
+                        field_pks.update({field: pks})
         return field_pks
 
     def create_many_to_many_related(self, instance, data):
         # data format {field: {
-        # ADD: [pks], 
-        # CREATE: [{sub_field: value}]
+        # ADD: [objs], 
+        # CREATE: [{sub_field: value}],
+        # SET: [objs]
         # }}
         field_pks = {}
         for field, values in data.items():
             for operation in values:
-                if operation == ADD:
-                    obj = getattr(instance, field)
-                    pks = values[operation]
-                    obj.set(pks)
-                    field_pks.update({field: pks})
-                elif operation == CREATE:
-                    obj = getattr(instance, field)
-                    pks = self.bulk_create_objs(field, values[operation])
-                    obj.set(pks)
-                    field_pks.update({field: pks})
+                with self.measure_write(field, operation):
+                    if self.deferred_links is not None and (
+                            operation in (ADD, SET)):
+                        obj = getattr(instance, field)
+                        objs = values[operation]
+                        self.deferred_links.append((
+                            obj,
+                            self.get_relation_info(field),
+                            objs,
+                            self.write_using
+                        ))
+                        field_pks.update({field: [obj.pk for obj in objs]})
+                    elif operation == ADD:
+                        obj = getattr(instance, field)
+                        objs = values[operation]
+                        obj.add(*objs)
+                        field_pks.update({field: [obj.pk for obj in objs]})
+                    elif operation == SET:
+                        # instance is new so there is nothing to unlink
+                        obj = getattr(instance, field)
+                        objs = values[operation]
+                        options = self.get_nested_options(field)
+                        bulk_link(
+                            obj,
+                            self.get_relation_info(field),
+                            objs,
+                            options["batch_size"],
+                            self.write_using
+                        )
+                        field_pks.update({field: [obj.pk for obj in objs]})
+                    elif operation == CREATE:
+                        obj = getattr(instance, field)
+                        options = self.get_nested_options(field)
+                        pks = []
+                        for chunk in self.iter_create_chunks(
+                                field, values[operation]):
+                            if options["bulk_create"]:
+                                objs = self.bulk_create_related(
+                                    field,
+                                    chunk,
+                                    need_pks=True
+                                )
+                                bulk_link(
+                                    obj,
+                                    self.get_relation_info(field),
+                                    objs,
+                                    options["batch_size"],
+                                    self.write_using
+                                )
+                                chunk_pks = [
+                                    nested_obj.pk for nested_obj in objs
+                                ]
+                            else:
+                                chunk_pks = self.bulk_create_objs(
+                                    field,
+                                    chunk
+                                )
+                                obj.add(*chunk_pks)
+                            pks.extend(chunk_pks)
+                        field_pks.update({field: pks})
         return field_pks
 
-    def create(self, validated_data):
-        fields = {
-            "foreignkey_related": { 
-                "replaceable": {},
-                "writable": {}
-            }, 
-            "many_to": {
-                "many_related": {},
-                "one_related": {}
-            }
-        }
+    def create_instance(self, validated_data):
+        # Like ModelSerializer.create but the instance is saved to
+        # write_using
+        raise_errors_on_nested_writes('create', self, validated_data)
+        ModelClass = self.Meta.model
+        info = model_meta.get_field_info(ModelClass)
 
-        # Make a partal copy of validated_data so that we can
-        # iterate and alter it
-        data = copy.copy(validated_data)
-        for field in data:
-            field_serializer = self.get_fields()[field]
-            if isinstance(field_serializer, Serializer):
-                if isinstance(field_serializer, _ReplaceableField):
-                    value = validated_data.pop(field)
-                    fields["foreignkey_related"]["replaceable"] \
-                        .update({field: value})
-                elif isinstance(field_serializer, _WritableField):
-                    value = validated_data.pop(field)
-                    fields["foreignkey_related"]["writable"]\
-                        .update({field: value})
-            elif (isinstance(field_serializer, ListSerializer) and 
-                    (isinstance(field_serializer, _WritableField) or 
-                    isinstance(field_serializer, _ReplaceableField))):
-
-                model = self.Meta.model
-                rel = getattr(model, field).rel
-    
-                if isinstance(rel, ManyToOneRel):
-                    value = validated_data.pop(field)
-                    fields["many_to"]["one_related"].update({field: value})
-                elif isinstance(rel, ManyToManyRel):
-                    value = validated_data.pop(field)
-                    fields["many_to"]["many_related"].update({field: value})
+        attrs = {}
+        many_to_many = {}
+        for attr, value in validated_data.items():
+            if attr in info.relations and info.relations[attr].to_many:
+                many_to_many[attr] = value
             else:
-                pass
+                attrs[attr] = value
+
+        manager = ModelClass._default_manager.db_manager(self.write_using)
+        instance = manager.create(**attrs)
+
+        for attr, value in many_to_many.items():
+            field = getattr(instance, attr)
+            field.set(value)
 
-        foreignkey_related = {
-            **self.create_replaceable_foreignkey_related(
+        return instance
+
+    def create(self, validated_data):
+        using = self.get_write_using()
+        self.write_using = using
+        if self.plan_deep_writes:
+            with nested_atomic(using):
+                instance = NestedWritePlanner(self).create(validated_data)
+            return self.prefetch_written(instance, using)
+
+        fields = self.split_nested_fields(validated_data)
+
+        # Write everything in one transaction
+        with nested_atomic(using):
+            foreignkey_related = self.create_replaceable_foreignkey_related(
                 fields["foreignkey_related"]["replaceable"]
-            ),
-            **self.create_writable_foreignkey_related(
-                fields["foreignkey_related"]["writable"]
             )
-        }
+            writable = fields["foreignkey_related"]["writable"]
+            for field, value in writable.items():
+                with self.nested_field_atomic(field):
+                    foreignkey_related.update(
+                        self.create_writable_foreignkey_related({field: value})
+                    )
 
-        instance = super().create({**validated_data, **foreignkey_related})
-        
-        self.create_many_to_many_related(
-            instance, 
-            fields["many_to"]["many_related"]
-        )
+            instance = self.create_instance(
+                {**validated_data, **foreignkey_related}
+            )
 
-        self.create_many_to_one_related(
-            instance, 
-            fields["many_to"]["one_related"]
-        )
-        
-        return instance
+            many_related = fields["many_to"]["many_related"]
+            for field, value in many_related.items():
+                with self.nested_field_atomic(field):
+                    self.create_many_to_many_related(instance, {field: value})
+
+            one_related = fields["many_to"]["one_related"]
+            for field, value in one_related.items():
+                with self.nested_field_atomic(field):
+                    self.create_many_to_one_related(instance, {field: value})
+
+        return self.prefetch_written(instance, using)
+
+    async def acreate(self, validated_data):
+        return await to_async(self.create)(validated_data)
 
 
-class NestedUpdateMixin(object):
+class NestedUpdateMixin(BaseNestedMixin):
     """ Update Mixin """
     def constrain_error_prefix(self, field):
         return f"Error on {field} field: "
 
     def update_replaceable_foreignkey_related(self, instance, data):
-        # data format {field: pk}
-        objs = {}
-        for field, pk in data.items():
-            model = self.get_fields()[field].Meta.model
-            nested_obj = model.objects.get(pk=pk)
-            setattr(instance, field, nested_obj)
-            instance.save()
-            objs.update({field: instance})
-        return objs
+        # data format {field: obj}, objs are saved with the instance
+        # by update_instance
+        return dict(data)
 
     def update_writable_foreignkey_related(self, instance, data):
         # data format {field: {sub_field: value}}
-        request = self.context.get("request")
-        context={"request": request}
         objs = {}
         for field, values in data.items():
-            # Get serializer class for nested field
-            SerializerClass = type(self.get_fields()[field])
             nested_obj = getattr(instance, field)
-            serializer = SerializerClass(
-                nested_obj, 
-                data=values, 
-                context=context
+            serializer = self.get_nested_serializer(field, nested_obj)
+            nested_fields = self.get_nested_fields(self.fields[field])
+            # The row is written unless values don't change anything
+            written = bool(
+                nested_fields.intersection(values) or
+                self.get_changed_fields(nested_obj, values) != set()
             )
-            serializer.is_valid()
-            serializer.save()
+            # values are already validated
+            with self.measure_write(field, UPDATE):
+                if written:
+                    serializer.update(nested_obj, values)
+                self.count_written_rows(field, int(written))
             objs.update({field: nested_obj})
         return objs
 
     def bulk_create_many_to_many_related(self, field, nested_obj, data):
-        request = self.context.get("request")
-        context={"request": request}
-        # Get serializer class for nested field
-        SerializerClass = type(self.get_fields()[field].child)
+        options = self.get_nested_options(field)
+        if options["bulk_create"]:
+            objs = self.bulk_create_related(field, data, need_pks=True)
+            bulk_link(
+                nested_obj,
+                self.get_relation_info(field),
+                objs,
+                options["batch_size"],
+                self.write_using
+            )
+            return [obj.pk for obj in objs]
+
         pks = []
         for values in data:
-            serializer = SerializerClass(data=values, context=context)
-            serializer.is_valid()
-            obj = serializer.save()
+            serializer = self.get_nested_serializer(field)
+            # values are already validated
+            obj = serializer.create(values)
             pks.append(obj.pk)
         nested_obj.add(*pks)
         return pks
 
     def bulk_create_many_to_one_related(self, field, nested_obj, data):
-        request = self.context.get("request")
-        context={"request": request}
-        # Get serializer class for nested field
-        SerializerClass = type(self.get_fields()[field].child)
+        if self.get_nested_options(field)["bulk_create"]:
+            objs = self.bulk_create_related(
+                field,
+                data,
+                related={
+                    self.get_relation_info(field)["foreignkey"]:
+                    nested_obj.instance
+                }
+            )
+            return [obj.pk for obj in objs]
+
         pks = []
         for values in data:
-            serializer = SerializerClass(data=values, context=context)
-            serializer.is_valid()
-            obj = serializer.save()
+            serializer = self.get_nested_serializer(field)
+            # values are already validated
+            obj = serializer.create(values)
             pks.append(obj.pk)
         return pks
 
+    def check_related_objs(self, field, objs, related_pks):
+        not_related = [obj.pk for obj in objs if obj.pk not in related_pks]
+        if not_related:
+            raise ValidationError({
+                field: [
+                    DOES_NOT_EXIST.format(pk_value=pk)
+                    for pk in not_related
+                ]
+            })
+
     def bulk_update_many_to_many_related(self, field, nested_obj, data):
-        # {pk: {sub_field: values}}
-        objs = []
-        request = self.context.get("request")
-        context={"request": request}
-        # Get serializer class for nested field
-        SerializerClass = type(self.get_fields()[field].child)
-        for pk, values in data.items():
-            obj = nested_obj.get(pk=pk)
-            serializer = SerializerClass(obj, data=values, context=context)
-            serializer.is_valid()
-            obj = serializer.save()
-            objs.append(obj)
-        return objs
+        # [(obj, {sub_field: values})]
+        # Make sure all objs belong to this relation with a single query
+        related_objs = [obj for obj, values in data]
+        related_pks = set()
+        pks = [obj.pk for obj in related_objs]
+        for chunk in chunked(pks, get_chunk_size(nested_obj.db)):
+            qs = nested_obj.filter(pk__in=chunk)
+            related_pks.update(qs.values_list("pk", flat=True))
+        self.check_related_objs(field, related_objs, related_pks)
+        if self.get_nested_options(field)["bulk_update"]:
+            return self.bulk_update_related(field, data)
+
+        return self.update_related_objs(field, data)
 
     def bulk_update_many_to_one_related(self, field, instance, data):
-        # {pk: {sub_field: values}}
-        objs = []
-        request = self.context.get("request")
-        context={"request": request}
-        # Get serializer class for nested field
-        SerializerClass = type(self.get_fields()[field].child)
-        model = self.Meta.model
-        foreignkey = getattr(model, field).field.name
-        nested_obj = getattr(instance, field)
-        for pk, values in data.items():
-            obj = nested_obj.get(pk=pk)
-            values.update({foreignkey: instance.pk})
-            serializer = SerializerClass(obj, data=values, context=context)
-            serializer.is_valid()
-            obj = serializer.save()
-            objs.append(obj)
-        return objs
+        # [(obj, {sub_field: values})]
+        field_plan = self.get_nested_write_plan()[field]
+        attname = field_plan["relation_info"]["foreignkey_attname"]
+        # objs are loaded on validation, so no query is needed here
+        related_objs = [obj for obj, values in data]
+        related_pks = {
+            obj.pk for obj in related_objs
+            if getattr(obj, attname) == instance.pk
+        }
+        self.check_related_objs(field, related_objs, related_pks)
+        if field_plan["options"]["bulk_update"]:
+            return self.bulk_update_related(field, data)
+
+        return self.update_related_objs(field, data)
+
+    def remove_many_to_one_related(self, field, nested_obj, objs):
+        # Remove objs in chunks using the field's remove strategy
+        field_plan = self.get_nested_write_plan()[field]
+        strategy = field_plan["options"]["remove_strategy"]
+        using = self.get_field_using(field)
+        qs = nested_obj.all().using(using)
+
+        pks = [obj.pk for obj in objs]
+        for chunk in chunked(pks, get_chunk_size(using)):
+            chunk_qs = qs.filter(pk__in=chunk)
+            if strategy == DETACH:
+                chunk_qs.update(**{field_plan["foreignkey"]: None})
+            else:
+                chunk_qs.delete()
 
     def update_many_to_one_related(self, instance, data):
         # data format {field: {
         # foreignkey_name: name:
         # data: {
-        # ADD: [{sub_field: value}], 
+        # ADD: [objs], 
         # CREATE: [{sub_field: value}], 
-        # REMOVE: [pk],
-        # UPDATE: {pk: {sub_field: value}} 
+        # REMOVE: [objs],
+        # UPDATE: [(obj, {sub_field: value})]
         # }}}
 
         for field, values in data.items():
             nested_obj = getattr(instance, field)
-            model = self.Meta.model
-            foreignkey = getattr(model, field).field.name
+            foreignkey = self.get_nested_write_plan()[field]["foreignkey"]
             for operation in values:
-                if operation == ADD:
-                    pks = values[operation]
-                    model = self.get_fields()[field].child.Meta.model
-                    qs = model.objects.filter(pk__in=pks)
-                    qs.update(**{foreignkey: instance.pk})
-                elif operation == CREATE:
-                    for v in values[operation]:
-                        v.update({foreignkey: instance.pk})
-                    self.bulk_create_many_to_one_related(
-                        field, 
-                        nested_obj, 
-                        values[operation]
-                    )
-                elif operation == REMOVE:
-                    qs = nested_obj.all()
-                    qs.filter(pk__in=values[operation]).delete()
-                elif operation == UPDATE:
-                    self.bulk_update_many_to_one_related(
-                        field, 
-                        instance,
-                        values[operation]
-                    )
-                else:
-                    message = (
-                        f"{operation} is an invalid operation, "
-                    )
-                    raise ValidationError(message)
+                with self.measure_write(field, operation):
+                    if operation == ADD:
+                        pks = [obj.pk for obj in values[operation]]
+                        model = self.get_nested_write_plan()[field]["model"]
+                        qs = model._default_manager.using(
+                            self.get_field_using(field)
+                        ).filter(pk__in=pks)
+                        qs.update(**{foreignkey: instance.pk})
+                    elif operation == CREATE:
+                        for chunk in self.iter_create_chunks(
+                                field, values[operation]):
+                            for v in chunk:
+                                v.update({foreignkey: instance})
+                            self.bulk_create_many_to_one_related(
+                                field,
+                                nested_obj,
+                                chunk
+                            )
+                    elif operation == REMOVE:
+                        self.remove_many_to_one_related(
+                            field,
+                            nested_obj,
+                            values[operation]
+                        )
+                    elif operation == UPDATE:
+                        self.bulk_update_many_to_one_related(
+                            field, 
+                            instance,
+                            values[operation]
+                        )
+                    else:
+                        message = (
+                            f"{operation} is an invalid operation, "
+                        )
+                        raise ValidationError(message)
         return instance
 
     def update_many_to_many_related(self, instance, data):
         # data format {field: {
-        # ADD: [{sub_field: value}], 
+        # ADD: [objs], 
         # CREATE: [{sub_field: value}], 
-        # REMOVE: [pk],
-        # UPDATE: {pk: {sub_field: value}} 
+        # REMOVE: [objs],
+        # UPDATE: [(obj, {sub_field: value})],
+        # SET: [objs]
         # }}
         for field, values in data.items():
             nested_obj = getattr(instance, field)
             for operation in values:
-                if operation == ADD:
-                    pks = values[operation]
-                    try:
-                        nested_obj.add(*pks)
-                    except Exception as e:
-                        msg = self.constrain_error_prefix(field) + str(e)
-                        raise ValidationError(msg)
-                elif operation == CREATE:
-                    self.bulk_create_many_to_many_related(
-                        field, 
-                        nested_obj, 
-                        values[operation]
-                    )
-                elif operation == REMOVE:
-                    pks = values[operation]
-                    try:
-                        nested_obj.remove(*pks)
-                    except Exception as e:
-                        msg = self.constrain_error_prefix(field) + str(e)
-                        raise ValidationError(msg)
-                elif operation == UPDATE:
-                    self.bulk_update_many_to_many_related(
-                        field, 
-                        nested_obj, 
-                        values[operation]
-                    )
-                else:
-                    message = (
-                        f"{operation} is an invalid operation, "
-                    )
-                    raise ValidationError(message)
+                with self.measure_write(field, operation):
+                    if operation == ADD:
+                        objs = values[operation]
+                        try:
+                            nested_obj.add(*objs)
+                        except Exception as e:
+                            msg = self.constrain_error_prefix(field) + str(e)
+                            raise ValidationError(msg)
+                    elif operation == CREATE:
+                        for chunk in self.iter_create_chunks(
+                                field, values[operation]):
+                            self.bulk_create_many_to_many_related(
+                                field,
+                                nested_obj,
+                                chunk
+                            )
+                    elif operation == REMOVE:
+                        objs = values[operation]
+                        try:
+                            nested_obj.remove(*objs)
+                        except Exception as e:
+                            msg = self.constrain_error_prefix(field) + str(e)
+                            raise ValidationError(msg)
+                    elif operation == UPDATE:
+                        self.bulk_update_many_to_many_related(
+                            field, 
+                            nested_obj, 
+                            values[operation]
+                        )
+                    elif operation == SET:
+                        options = self.get_nested_options(field)
+                        bulk_set(
+                            nested_obj,
+                            self.get_relation_info(field),
+                            values[operation], 
+                            options["batch_size"],
+                            self.write_using
+                        )
+                    else:
+                        message = (
+                            f"{operation} is an invalid operation, "
+                        )
+                        raise ValidationError(message)
         return instance
 
     def update(self, instance, validated_data):
-        fields = {
-            "foreignkey_related": { 
-                "replaceable": {},
-                "writable": {}
-            },
-            "many_to": {
-                "many_related": {},
-                "one_related": {}
-            }
-        }
+        fields = self.split_nested_fields(validated_data)
+        self.nested_rows_written = {}
 
-        # Make a partal copy of validated_data so that we can
-        # iterate and alter it
-        data = copy.copy(validated_data)
-        for field in data:
-            field_serializer = self.get_fields()[field]
-            if isinstance(field_serializer, Serializer):
-                if isinstance(field_serializer, _ReplaceableField):
-                    value = validated_data.pop(field)
-                    fields["foreignkey_related"]["replaceable"] \
-                        .update({field: value})
-                elif isinstance(field_serializer, _WritableField):
-                    value = validated_data.pop(field)
-                    fields["foreignkey_related"]["writable"] \
-                        .update({field: value})
-            elif (isinstance(field_serializer, ListSerializer) and
-                    (isinstance(field_serializer, _WritableField) or 
-                    isinstance(field_serializer, _ReplaceableField))):
-                model = self.Meta.model
-                rel = getattr(model, field).rel
-    
-                if isinstance(rel, ManyToOneRel):
-                    value = validated_data.pop(field)
-                    fields["many_to"]["one_related"].update({field: value})
-                elif isinstance(rel, ManyToManyRel):
-                    value = validated_data.pop(field)
-                    fields["many_to"]["many_related"].update({field: value})
-            else:
-                pass
+        # Write everything in one transaction
+        using = self.get_write_using(instance)
+        self.write_using = using
+        with nested_atomic(using):
+            foreignkey_related = self.update_replaceable_foreignkey_related(
+                instance,
+                fields["foreignkey_related"]["replaceable"]
+            )
 
-        self.update_replaceable_foreignkey_related(
-            instance,
-            fields["foreignkey_related"]["replaceable"]
-        )
-        self.update_writable_foreignkey_related(
-            instance,
-            fields["foreignkey_related"]["writable"]
-        )
+            writable = fields["foreignkey_related"]["writable"]
+            for field, value in writable.items():
+                with self.nested_field_atomic(field):
+                    self.update_writable_foreignkey_related(
+                        instance,
+                        {field: value}
+                    )
 
-        self.update_many_to_many_related(
-            instance,
-            fields["many_to"]["many_related"]
-        )
+            many_related = fields["many_to"]["many_related"]
+            for field, value in many_related.items():
+                with self.nested_field_atomic(field):
+                    self.update_many_to_many_related(instance, {field: value})
+
+            one_related = fields["many_to"]["one_related"]
+            for field, value in one_related.items():
+                with self.nested_field_atomic(field):
+                    self.update_many_to_one_related(instance, {field: value})
+
+            instance = self.update_instance(
+                instance,
+                {**validated_data, **foreignkey_related}
+            )
+        # Not loaded back, DRF's UpdateModelMixin clears the prefetch
+        # cache of updated instances before rendering them
+        return self.drop_written(instance)
 
-        self.update_many_to_one_related(
-            instance,
-            fields["many_to"]["one_related"]
+    def can_save_changed_fields(self, instance):
+        # Columns set by an overridden save() or by pre_save receivers
+        # would be left out of update_fields, so such models are saved
+        # whole
+        model = type(instance)
+        return (
+            model.save is Model.save and
+            not signals.pre_save.has_listeners(model)
         )
 
-        return super().update(instance, validated_data)
\ No newline at end of file
+    def update_instance(self, instance, validated_data):
+        # Like ModelSerializer.update but scalar & foreign key changes
+        # are written with one save limited to the changed columns when
+        # nothing else can change on save
+        raise_errors_on_nested_writes('update', self, validated_data)
+        info = model_meta.get_field_info(instance)
+
+        attrs = {}
+        m2m_fields = []
+        for attr, value in validated_data.items():
+            if attr in info.relations and info.relations[attr].to_many:
+                m2m_fields.append((attr, value))
+            else:
+                attrs[attr] = value
+
+        changed = None
+        if self.can_save_changed_fields(instance):
+            changed = self.get_changed_fields(instance, attrs)
+        for attr, value in attrs.items():
+            setattr(instance, attr, value)
+
+        if changed is None:
+            instance.save(using=self.write_using)
+        elif changed:
+            # auto_now fields are set by save() so they change too
+            changed.update(
+                field.name for field in instance._meta.concrete_fields
+                if getattr(field, "auto_now", False)
+            )
+            instance.save(
+                using=self.write_using,
+                update_fields=sorted(changed)
+            )
+
+        for attr, value in m2m_fields:
+            field = getattr(instance, attr)
+            field.set(value)
+
+        return instance
+
+    async def aupdate(self, instance, validated_data):
+        return await to_async(self.update)(instance, validated_data)
\ No newline at end of file
@@ -1,4 +1,5 @@
 ADD = "add"
 CREATE = "create"
 REMOVE = "remove"
-UPDATE = "update"
\ No newline at end of file
+UPDATE = "update"
+SET = "set"
\ No newline at end of file
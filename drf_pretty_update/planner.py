@@ -0,0 +1,201 @@
+from collections import OrderedDict
+
+from rest_framework.serializers import ValidationError
+from rest_framework.utils import model_meta
+
+from .operations import ADD, CREATE, SET
+from .relations import FOREIGNKEY, MANY_TO_MANY
+from .utils import bulk_link_many, can_return_pks_from_bulk_insert
+
+
+class WriteNode(object):
+    """ An object to insert, with the nodes it depends on """
+    def __init__(self, model, using):
+        self.model = model
+        # Database alias the node is inserted to
+        self.using = using
+        self.attrs = {}
+        # {field: WriteNode}, writable foreign keys
+        self.foreignkeys = {}
+        # (foreignkey_name, WriteNode), set on many to one children
+        self.parent = None
+        # {field: value}, to many values of non nested fields
+        self.to_many = {}
+        self.obj = None
+
+    def dependencies(self):
+        nodes = list(self.foreignkeys.values())
+        if self.parent is not None:
+            nodes.append(self.parent[1])
+        return nodes
+
+
+class NestedWritePlanner(object):
+    """
+    Creates the whole validated tree of a nested serializer, parents
+    before children for foreign keys & both sides before through rows,
+    with one bulk insert per model and depth instead of one per object
+    """
+    def __init__(self, serializer):
+        self.serializer = serializer
+        self.nodes = []
+        # [(field, relation_info, WriteNode, [WriteNode or obj])]
+        self.links = []
+        # [(model, using, foreignkey_name, WriteNode, [obj])]
+        self.foreignkey_updates = []
+
+    def add(self, serializer_class, model, validated_data, using):
+        # Walk validated_data of serializer_class & its nested fields,
+        # nested objects go to their field's using option or to using
+        node = WriteNode(model, using)
+        plan = {}
+        if hasattr(serializer_class, "get_nested_write_plan"):
+            plan = serializer_class.get_nested_write_plan()
+        info = model_meta.get_field_info(model)
+
+        for field, value in validated_data.items():
+            field_plan = plan.get(field)
+            if field_plan is None:
+                if field in info.relations and info.relations[field].to_many:
+                    node.to_many[field] = value
+                else:
+                    node.attrs[field] = value
+                continue
+
+            SerializerClass = field_plan["serializer_class"]
+            related_model = field_plan["model"]
+            field_using = field_plan["options"]["using"] or using
+            if field_plan["relation"] == FOREIGNKEY:
+                if field_plan["kind"] == "writable":
+                    node.foreignkeys[field] = self.add(
+                        SerializerClass, related_model, value, field_using
+                    )
+                else:
+                    node.attrs[field] = value
+                continue
+
+            for operation, values in value.items():
+                if operation == CREATE:
+                    values = self.created_items(field, field_plan, values)
+                if field_plan["relation"] == MANY_TO_MANY:
+                    if operation == CREATE:
+                        values = [
+                            self.add(
+                                SerializerClass,
+                                related_model,
+                                item,
+                                field_using
+                            )
+                            for item in values
+                        ]
+                    # ADD & SET are the same on a new instance
+                    self.links.append(
+                        (field, field_plan["relation_info"], node, values)
+                    )
+                elif operation == CREATE:
+                    for item in values:
+                        child = self.add(
+                            SerializerClass, related_model, item, field_using
+                        )
+                        child.parent = (field_plan["foreignkey"], node)
+                elif operation == ADD:
+                    self.foreignkey_updates.append((
+                        related_model,
+                        field_using,
+                        field_plan["foreignkey"],
+                        node,
+                        values
+                    ))
+                elif operation != SET:
+                    raise ValidationError(
+                        f"{operation} is an invalid operation, "
+                    )
+
+        self.nodes.append(node)
+        return node
+
+    def created_items(self, field, field_plan, values):
+        # "create" lists of fields with a chunk_size are generators
+        if not field_plan["options"]["chunk_size"]:
+            return values
+        try:
+            return [item for chunk in values for item in chunk]
+        except ValidationError as e:
+            raise ValidationError({field: e.detail})
+
+    def get_ranks(self):
+        # {WriteNode: rank}, nodes come after the nodes they depend on
+        ranks = {}
+
+        def rank(node):
+            if node not in ranks:
+                ranks[node] = 1 + max(
+                    [rank(dependency) for dependency in node.dependencies()],
+                    default=-1
+                )
+            return ranks[node]
+
+        for node in self.nodes:
+            rank(node)
+        return ranks
+
+    def insert_nodes(self):
+        # One insert per (rank, model, using), objs are saved one by one
+        # on backends which can't return pks of rows inserted in bulk
+        ranks = self.get_ranks()
+        groups = OrderedDict()
+        for node in sorted(self.nodes, key=lambda node: ranks[node]):
+            key = (ranks[node], node.model, node.using)
+            groups.setdefault(key, []).append(node)
+
+        for (rank, model, using), nodes in groups.items():
+            for node in nodes:
+                for field, foreignkey_node in node.foreignkeys.items():
+                    node.attrs[field] = foreignkey_node.obj
+                if node.parent is not None:
+                    foreignkey, parent = node.parent
+                    node.attrs[foreignkey] = parent.obj
+                node.obj = model(**node.attrs)
+
+            objs = [node.obj for node in nodes]
+            if can_return_pks_from_bulk_insert(using):
+                model._default_manager.db_manager(using).bulk_create(objs)
+            else:
+                for obj in objs:
+                    obj.save(force_insert=True, using=using)
+
+    def update_foreignkeys(self):
+        for model, using, foreignkey, node, objs in self.foreignkey_updates:
+            model._default_manager.using(using).filter(
+                pk__in=[obj.pk for obj in objs]
+            ).update(**{foreignkey: node.obj.pk})
+
+    def insert_links(self):
+        # One insert per through model, links go with their source obj
+        bulk_link_many([
+            (
+                getattr(node.obj, field),
+                relation,
+                [
+                    target.obj if isinstance(target, WriteNode) else target
+                    for target in targets
+                ],
+                node.using
+            )
+            for field, relation, node, targets in self.links
+        ])
+
+    def create(self, validated_data):
+        root = self.add(
+            type(self.serializer),
+            self.serializer.Meta.model,
+            validated_data,
+            self.serializer.write_using
+        )
+        self.insert_nodes()
+        self.update_foreignkeys()
+        self.insert_links()
+        for node in self.nodes:
+            for field, value in node.to_many.items():
+                getattr(node.obj, field).set(value)
+        return root.obj
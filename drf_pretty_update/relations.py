@@ -0,0 +1,77 @@
+FOREIGNKEY = "foreignkey"
+MANY_TO_ONE = "many_to_one"
+MANY_TO_MANY = "many_to_many"
+
+# {(model, field_name): relation}
+_relations = {}
+
+
+def get_relation(model, field_name):
+    # Relations are read from Model._meta once per (model, field_name)
+    key = (model, field_name)
+    relation = _relations.get(key)
+    if relation is None:
+        relation = build_relation(model, field_name)
+        _relations[key] = relation
+    return relation
+
+
+def build_relation(model, field_name):
+    # relation format {
+    # type: foreignkey|many_to_one|many_to_many,
+    # model: related model,
+    # foreignkey: name, foreignkey_attname: attname, null: bool,
+    # (foreignkey on the related model for many_to_one)
+    # through: model, source_attname: attname, target_attname: attname
+    # (many_to_many only, columns of the through model pointing to
+    # model & related model)
+    # }
+    field = model._meta.get_field(field_name)
+    relation = {
+        "model": field.related_model,
+        "foreignkey": None,
+        "foreignkey_attname": None,
+        "null": None,
+        "through": None,
+        "source_attname": None,
+        "target_attname": None
+    }
+
+    if field.many_to_many:
+        if field.concrete:
+            # Forward many to many field
+            m2m_field = field
+            source, target = (
+                m2m_field.m2m_field_name(),
+                m2m_field.m2m_reverse_field_name()
+            )
+        else:
+            # Reverse many to many relation
+            m2m_field = field.field
+            source, target = (
+                m2m_field.m2m_reverse_field_name(),
+                m2m_field.m2m_field_name()
+            )
+        through = m2m_field.remote_field.through
+        relation.update({
+            "type": MANY_TO_MANY,
+            "through": through,
+            "source_attname": through._meta.get_field(source).attname,
+            "target_attname": through._meta.get_field(target).attname
+        })
+    elif field.one_to_many:
+        # Reverse foreign key
+        relation.update({
+            "type": MANY_TO_ONE,
+            "foreignkey": field.field.name,
+            "foreignkey_attname": field.field.attname,
+            "null": field.field.null
+        })
+    else:
+        relation.update({
+            "type": FOREIGNKEY,
+            "foreignkey": field.name,
+            "foreignkey_attname": field.attname,
+            "null": field.null
+        })
+    return relation
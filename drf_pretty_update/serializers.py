@@ -1,9 +1,129 @@
-from rest_framework.serializers import ModelSerializer
+from django.db.models import prefetch_related_objects
+from rest_framework.serializers import (
+    LIST_SERIALIZER_KWARGS, ListSerializer, ModelSerializer
+)
+
+from .fields import _ReplaceableField, _WritableField
+from .mixins import (
+    NestedCreateMixin, NestedUpdateMixin, nested_atomic, to_async
+)
+from .operations import ADD, REMOVE, UPDATE, SET
+from .utils import bulk_link_many, get_pk_cache, prefetch_pks
+
+
+class NestedListSerializer(ListSerializer):
+    """ Validates & writes nested pk operations of all items at once """
+    def get_nested_pks(self, data):
+        # {pk cache key: (queryset, [pk], field)} referenced by pk
+        # operations & pk based nested fields of all items, field is
+        # the list field of pk only lookups and None for whole objs
+        pks = {}
+
+        def add(queryset_and_key, values, field=None):
+            queryset, key = queryset_and_key
+            pks.setdefault(key, (queryset, [], field))[1].extend(values)
+
+        if not isinstance(data, list):
+            return pks
+        items = [item for item in data if isinstance(item, dict)]
+        nested_field = (_ReplaceableField, _WritableField)
+        for field_name, field in self.child.fields.items():
+            is_list = isinstance(field, ListSerializer)
+            if isinstance(field, _ReplaceableField) and not is_list:
+                add(field.get_pk_queryset(), [
+                    item[field_name] for item in items
+                    if item.get(field_name) is not None
+                ])
+                continue
+            if not (is_list and isinstance(field, nested_field)):
+                continue
+            for item in items:
+                value = item.get(field_name)
+                if not isinstance(value, dict):
+                    continue
+                for operation in (ADD, REMOVE, SET):
+                    if isinstance(value.get(operation), list):
+                        add(
+                            field.get_pk_queryset(pk_only=True),
+                            value[operation],
+                            field
+                        )
+                if isinstance(value.get(UPDATE), dict):
+                    add(field.get_pk_queryset(), value[UPDATE])
+        return pks
+
+    def to_internal_value(self, data):
+        # Items look their pks up in the objs fetched here, whole objs
+        # are fetched first so pk only lookups can reuse them
+        nested_pks = self.get_nested_pks(data)
+        pk_only_last = lambda key: nested_pks[key][2] is not None
+        for key in sorted(nested_pks, key=pk_only_last):
+            queryset, pks, field = nested_pks[key]
+            if not pks:
+                continue
+            if field is None:
+                cache = get_pk_cache(self.context, key)
+            else:
+                cache = field.get_pk_list_cache(key, pk_only=True)
+            prefetch_pks(queryset, pks, cache)
+        return super().to_internal_value(data)
+
+    def create(self, validated_data):
+        # Many to many links of all items are inserted at once, links
+        # of through models with m2m_changed receivers are added one
+        # instance at a time so the receivers run, see bulk_link_many
+        links = []
+        self.child.deferred_links = links
+        using = self.child.get_write_using()
+        try:
+            with nested_atomic(using):
+                instances = [
+                    self.child.create(attrs) for attrs in validated_data
+                ]
+                bulk_link_many(links)
+        finally:
+            self.child.deferred_links = None
+
+        prefetch_related_objects(
+            instances,
+            *self.child.get_read_back_lookups()
+        )
+        return instances
 
-from .mixins import NestedCreateMixin, NestedUpdateMixin
 
 class NestedModelSerializer(
         NestedCreateMixin, 
         NestedUpdateMixin, 
         ModelSerializer):
-    pass
\ No newline at end of file
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        # Like BaseSerializer.many_init but top level lists are
+        # NestedListSerializers unless Meta.list_serializer_class
+        # says otherwise
+        allow_empty = kwargs.pop('allow_empty', None)
+        child_serializer = cls(*args, **kwargs)
+        list_kwargs = {'child': child_serializer}
+        if allow_empty is not None:
+            list_kwargs['allow_empty'] = allow_empty
+        list_kwargs.update({
+            key: value for key, value in kwargs.items()
+            if key in LIST_SERIALIZER_KWARGS
+        })
+        list_serializer_class = getattr(
+            cls.Meta,
+            "list_serializer_class",
+            NestedListSerializer
+        )
+        return list_serializer_class(*args, **list_kwargs)
+
+
+class ANestedModelSerializer(NestedModelSerializer):
+    """ NestedModelSerializer for async views """
+    async def ais_valid(self, raise_exception=False):
+        return await to_async(self.is_valid)(raise_exception=raise_exception)
+
+    async def asave(self, **kwargs):
+        return await to_async(self.save)(**kwargs)
+
+    async def adata(self):
+        return await to_async(lambda: self.data)()
@@ -0,0 +1,199 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import connections, router
+from django.db.models.signals import m2m_changed
+from rest_framework.serializers import ValidationError
+
+
+# Context key of {(model, scope, using): {pk: obj}}, objs already
+# fetched for pk validation, scope tells querysets of the same model
+# apart and using is the database alias they are read from
+PK_CACHE = "nested_pk_cache"
+
+# Used when the database backend doesn't report any limit
+DEFAULT_CHUNK_SIZE = 2000
+
+# Leave room for the parameters used by the rest of the query
+QUERY_PARAMS_MARGIN = 50
+
+NOT_A_LIST = 'Expected a list of items but got type "{input_type}".'
+DOES_NOT_EXIST = 'Invalid pk "{pk_value}" - object does not exist.'
+INCORRECT_TYPE = 'Incorrect type. Expected pk value, received {data_type}.'
+
+
+def get_chunk_size(using):
+    connection = connections[using]
+    limits = [
+        connection.features.max_query_params,
+        connection.ops.max_in_list_size()
+    ]
+    limits = [limit - QUERY_PARAMS_MARGIN for limit in limits if limit]
+    return min(limits) if limits else DEFAULT_CHUNK_SIZE
+
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def get_pk_cache(context, key):
+    # {pk: obj} of a (model, scope, using) key kept in the serializer context,
+    # so a pk is fetched once per context (i.e. per request) however
+    # many nested fields & operations refer to it
+    return context.setdefault(PK_CACHE, {}).setdefault(key, {})
+
+
+def resolve_pks(queryset, pks, cache=None):
+    # Fetch objects for all pks with one `pk__in` query per chunk
+    # and return them in the same order as pks
+    pks, normalized_pks, objs = fetch_pks(queryset, pks, cache)
+    missing_pks = [
+        pk for pk, normalized_pk in zip(pks, normalized_pks)
+        if normalized_pk not in objs
+    ]
+    if missing_pks:
+        raise ValidationError([
+            DOES_NOT_EXIST.format(pk_value=pk)
+            for pk in dict.fromkeys(missing_pks)
+        ])
+
+    return [objs[pk] for pk in normalized_pks]
+
+
+def fetch_pks(queryset, pks, cache=None):
+    # Returns (pks, normalized pks, {normalized pk: obj}), pks which
+    # don't exist are left out of the objs dict. cache is a
+    # {normalized pk: obj} dict of objs already fetched from queryset,
+    # only the other pks are queried & added to it
+    if isinstance(pks, str) or not hasattr(pks, '__iter__'):
+        raise ValidationError(
+            NOT_A_LIST.format(input_type=type(pks).__name__)
+        )
+
+    pks = list(pks)
+    pk_field = queryset.model._meta.pk
+    normalized_pks = []
+    for pk in pks:
+        try:
+            if isinstance(pk, bool):
+                raise TypeError
+            normalized_pks.append(pk_field.to_python(pk))
+        except (DjangoValidationError, TypeError, ValueError):
+            raise ValidationError(
+                INCORRECT_TYPE.format(data_type=type(pk).__name__)
+            )
+
+    cache = {} if cache is None else cache
+    objs = {pk: cache[pk] for pk in normalized_pks if pk in cache}
+    unique_pks = [
+        pk for pk in dict.fromkeys(normalized_pks) if pk not in objs
+    ]
+    for chunk in chunked(unique_pks, get_chunk_size(queryset.db)):
+        for obj in queryset.filter(pk__in=chunk):
+            objs[obj.pk] = obj
+            cache[obj.pk] = obj
+    return pks, normalized_pks, objs
+
+
+def prefetch_pks(queryset, pks, cache):
+    # Add objs of valid pks to cache, invalid pks are left for
+    # validation to report
+    pk_field = queryset.model._meta.pk
+    valid_pks = []
+    for pk in pks:
+        try:
+            if isinstance(pk, bool):
+                raise TypeError
+            valid_pks.append(pk_field.to_python(pk))
+        except (DjangoValidationError, TypeError, ValueError):
+            continue
+    fetch_pks(queryset, valid_pks, cache)
+
+
+def can_return_pks_from_bulk_insert(using):
+    features = connections[using].features
+    return getattr(
+        features,
+        "can_return_rows_from_bulk_insert",
+        getattr(features, "can_return_ids_from_bulk_insert", False)
+    )
+
+
+def bulk_link(manager, relation, objs, batch_size=None, using=None):
+    # Insert through table rows for a many to many manager at once,
+    # m2m_changed signals are skipped. relation is the manager's
+    # relation from drf_pretty_update.relations, rows go to using or
+    # the router's write database for the manager's instance
+    through = relation["through"]
+    if not through._meta.auto_created:
+        manager.add(*objs)
+        return
+    source = relation["source_attname"]
+    target = relation["target_attname"]
+    rows = [
+        through(**{source: manager.instance.pk, target: obj.pk})
+        for obj in objs
+    ]
+    using = using or router.db_for_write(through, instance=manager.instance)
+    through._default_manager.using(using).bulk_create(
+        rows,
+        batch_size=batch_size
+    )
+
+
+def bulk_link_many(links, batch_size=None):
+    # links format [(manager, relation, objs, using)], rows of all links
+    # to the same through model & alias are inserted with one bulk
+    # insert, using None means the router's write database. Through
+    # models with m2m_changed receivers are linked with manager.add()
+    # one link at a time so their receivers still run
+    rows = {}
+    for manager, relation, objs, using in links:
+        through = relation["through"]
+        if (not through._meta.auto_created or
+                m2m_changed.has_listeners(through)):
+            manager.add(*objs)
+            continue
+        using = using or router.db_for_write(
+            through,
+            instance=manager.instance
+        )
+        through_rows = rows.setdefault((through, using), {})
+        for obj in objs:
+            key = (manager.instance.pk, obj.pk)
+            through_rows[key] = through(**{
+                relation["source_attname"]: manager.instance.pk,
+                relation["target_attname"]: obj.pk
+            })
+
+    for (through, using), through_rows in rows.items():
+        through._default_manager.using(using).bulk_create(
+            list(through_rows.values()),
+            batch_size=batch_size
+        )
+
+
+def bulk_set(manager, relation, objs, batch_size=None, using=None):
+    # Make objs the only ones linked by a many to many manager with one
+    # query for current links, one bulk insert & one delete per chunk,
+    # unchanged links cost no writes & m2m_changed signals are skipped
+    through = relation["through"]
+    if not through._meta.auto_created:
+        manager.set(objs)
+        return
+    source = relation["source_attname"]
+    target = relation["target_attname"]
+    using = using or router.db_for_write(through, instance=manager.instance)
+    links = through._default_manager.using(using).filter(
+        **{source: manager.instance.pk}
+    )
+
+    linked_pks = set(links.values_list(target, flat=True))
+    new_objs = list({
+        obj.pk: obj for obj in objs if obj.pk not in linked_pks
+    }.values())
+    removed_pks = list(linked_pks - {obj.pk for obj in objs})
+
+    for chunk in chunked(removed_pks, get_chunk_size(using)):
+        links.filter(**{target + "__in": chunk}).delete()
+    if new_objs:
+        bulk_link(manager, relation, new_objs, batch_size, using)
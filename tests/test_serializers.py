@@ -0,0 +1,746 @@
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.db import connection, connections
+from django.db.models import Model, signals
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.serializers import ListSerializer, ModelSerializer
+from rest_framework.test import APIRequestFactory
+from drf_pretty_update.exceptions import InvalidOperation
+from drf_pretty_update.instrumentation import no_measurement
+from drf_pretty_update.fields import (
+    NestedField, serializer_class_without_field
+)
+from drf_pretty_update.relations import get_relation
+from drf_pretty_update.serializers import (
+    NestedModelSerializer, ANestedModelSerializer, NestedListSerializer
+)
+from tests.testapp.models import Book, Course, Note, Phone, Student
+from tests.testapp.serializers import (
+    BookSerializer, PhoneSerializer, WritableCourseSerializer,
+    WritableStudentSerializer, ReplaceableStudentSerializer
+)
+
+
+class SerializerTests(TestCase):
+    def test_nested_write_plan(self):
+        plan = WritableStudentSerializer.get_nested_write_plan()
+        self.assertIs(plan, WritableStudentSerializer.get_nested_write_plan())
+        self.assertEqual(
+            {field: plan[field]["relation"] for field in plan},
+            {"course": "foreignkey", "phone_numbers": "many_to_one"}
+        )
+        self.assertEqual(plan["course"]["kind"], "writable")
+        self.assertEqual(plan["course"]["model"], Course)
+        self.assertEqual(plan["phone_numbers"]["model"], Phone)
+        self.assertEqual(plan["phone_numbers"]["foreignkey"], "student")
+
+    def test_relation_registry(self):
+        relation = get_relation(Student, "phone_numbers")
+        self.assertIs(relation, get_relation(Student, "phone_numbers"))
+        self.assertEqual(relation["type"], "many_to_one")
+        self.assertEqual(relation["model"], Phone)
+        self.assertEqual(relation["foreignkey_attname"], "student_id")
+        self.assertFalse(relation["null"])
+
+        relation = get_relation(Course, "books")
+        self.assertEqual(relation["type"], "many_to_many")
+        self.assertEqual(relation["through"], Course.books.through)
+        self.assertEqual(relation["source_attname"], "course_id")
+        self.assertEqual(relation["target_attname"], "book_id")
+
+        relation = get_relation(Book, "courses")
+        self.assertEqual(relation["source_attname"], "book_id")
+        self.assertEqual(relation["target_attname"], "course_id")
+
+        relation = get_relation(Student, "course")
+        self.assertEqual(relation["type"], "foreignkey")
+        self.assertEqual(relation["model"], Course)
+
+    def test_read_back_lookups(self):
+        self.assertEqual(
+            WritableStudentSerializer.get_read_back_lookups(),
+            ["course", "course__books", "phone_numbers"]
+        )
+
+    def test_written_instance_is_rendered_without_queries(self):
+        serializer = WritableStudentSerializer(
+            data={
+                "name": "Yezy",
+                "age": 33,
+                "course": {
+                    "name": "Programming",
+                    "code": "CS50",
+                    "books": {"create": [
+                        {"title": "Python", "author": "S.Mobit"}
+                    ]}
+                },
+                "phone_numbers": {"create": [
+                    {"number": "076711110", "type": "Office"}
+                ]}
+            },
+            context={"request": APIRequestFactory().post("/")}
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        with self.assertNumQueries(0):
+            data = serializer.data
+        self.assertEqual(data["course"]["books"][0]["title"], "Python")
+        self.assertEqual(data["phone_numbers"][0]["number"], "076711110")
+
+    def test_nested_write_plan_is_per_class(self):
+        plan = ReplaceableStudentSerializer.get_nested_write_plan()
+        self.assertEqual(list(plan), ["course"])
+        self.assertEqual(plan["course"]["kind"], "replaceable")
+
+    def test_identical_nested_fields_share_classes(self):
+        field1 = NestedField(BookSerializer, many=True, required=False)
+        field2 = NestedField(BookSerializer, many=True)
+        field3 = NestedField(BookSerializer, many=True, accept_pk=True)
+        self.assertIs(type(field1), type(field2))
+        self.assertIs(type(field1.child), type(field2.child))
+        self.assertIsNot(type(field1.child), type(field3.child))
+
+    def test_serializer_class_without_field(self):
+        SerializerClass = serializer_class_without_field(
+            PhoneSerializer, 
+            "student"
+        )
+        self.assertIs(
+            SerializerClass, 
+            serializer_class_without_field(PhoneSerializer, "student")
+        )
+        self.assertEqual(SerializerClass.Meta.fields, ['number', 'type'])
+        self.assertEqual(
+            PhoneSerializer.Meta.fields, 
+            ['number', 'type', 'student']
+        )
+
+    def test_invalid_remove_strategy(self):
+        with self.assertRaises(InvalidOperation):
+            NestedField(PhoneSerializer, many=True, remove_strategy="drop")
+
+    def test_detach_requires_nullable_foreignkey(self):
+        class DetachStudentSerializer(NestedModelSerializer):
+            phone_numbers = NestedField(
+                PhoneSerializer,
+                many=True,
+                remove_strategy="detach"
+            )
+
+            class Meta:
+                model = Student
+                fields = ['name', 'age', 'phone_numbers']
+
+        with self.assertRaises(InvalidOperation):
+            DetachStudentSerializer.get_nested_write_plan()
+
+    def test_detach_remove(self):
+        class NoteSerializer(NestedModelSerializer):
+            class Meta:
+                model = Note
+                fields = ['text']
+
+        class DetachStudentSerializer(NestedModelSerializer):
+            notes = NestedField(
+                NoteSerializer,
+                many=True,
+                remove_strategy="detach"
+            )
+
+            class Meta:
+                model = Student
+                fields = ['name', 'age', 'notes']
+
+        course = Course.objects.create(name="Programming", code="CS50")
+        student = Student.objects.create(name="Yezy", age=33, course=course)
+        notes = [
+            Note.objects.create(text=text, student=student)
+            for text in ["First", "Second", "Third"]
+        ]
+        serializer = DetachStudentSerializer(
+            student,
+            data={"notes": {"remove": [notes[0].pk, notes[1].pk]}},
+            context={"request": APIRequestFactory().patch("/")},
+            partial=True
+        )
+        serializer.is_valid(raise_exception=True)
+        with mock.patch(
+                "drf_pretty_update.mixins.get_chunk_size", return_value=1):
+            with CaptureQueriesContext(connection) as queries:
+                serializer.save()
+        updates = [
+            query["sql"] for query in queries.captured_queries
+            if query["sql"].startswith('UPDATE "testapp_note"')
+        ]
+        self.assertEqual(len(updates), 2)
+        self.assertEqual(Note.objects.count(), 3)
+        self.assertEqual(
+            list(student.notes.values_list("pk", flat=True)),
+            [notes[2].pk]
+        )
+        self.assertEqual(
+            Note.objects.filter(student=None).count(), 2
+        )
+
+    def test_fast_delete_is_delete(self):
+        class FastDeleteStudentSerializer(NestedModelSerializer):
+            phone_numbers = NestedField(
+                PhoneSerializer,
+                many=True,
+                remove_strategy="fast_delete"
+            )
+
+            class Meta:
+                model = Student
+                fields = ['name', 'age', 'phone_numbers']
+
+        course = Course.objects.create(name="Programming", code="CS50")
+        student = Student.objects.create(name="Yezy", age=33, course=course)
+        other = Student.objects.create(name="Juma", age=24, course=course)
+        phones = [
+            Phone.objects.create(number=number, type="Office", student=owner)
+            for number, owner in [
+                ("076711110", student),
+                ("076711111", student),
+                ("076711112", other)
+            ]
+        ]
+        serializer = FastDeleteStudentSerializer(
+            student,
+            data={"phone_numbers": {
+                "remove": [phones[0].pk, phones[1].pk]
+            }},
+            context={"request": APIRequestFactory().patch("/")},
+            partial=True
+        )
+        serializer.is_valid(raise_exception=True)
+        with self.assertNumQueries(3):
+            serializer.save()
+        self.assertEqual(
+            list(Phone.objects.values_list("pk", flat=True)),
+            [phones[2].pk]
+        )
+
+    def test_unmeasured_write_does_no_setup(self):
+        serializer = WritableStudentSerializer()
+        with mock.patch.object(
+                serializer, "get_field_using", side_effect=AssertionError):
+            self.assertIs(
+                serializer.measure_write("phone_numbers", "update"),
+                no_measurement
+            )
+
+    def rename_student(self, name):
+        course = Course.objects.create(name="Programming", code="CS50")
+        student = Student.objects.create(name="Yezy", age=2, course=course)
+        serializer = ReplaceableStudentSerializer(
+            student,
+            data={"name": name},
+            context={"request": APIRequestFactory().patch("/")},
+            partial=True
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Student.objects.get(pk=student.pk)
+
+    def test_update_saves_columns_derived_by_save(self):
+        def save(student, *args, **kwargs):
+            student.age = len(student.name)
+            return Model.save(student, *args, **kwargs)
+
+        with mock.patch.object(Student, "save", save):
+            student = self.rename_student("Yezy M")
+        self.assertEqual(student.age, 6)
+
+    def test_update_saves_columns_derived_by_pre_save(self):
+        def derive_age(sender, instance, **kwargs):
+            instance.age = len(instance.name)
+
+        signals.pre_save.connect(derive_age, sender=Student)
+        try:
+            student = self.rename_student("Yezy M")
+        finally:
+            signals.pre_save.disconnect(derive_age, sender=Student)
+        self.assertEqual(student.age, 6)
+
+    def test_async_save(self):
+        class AsyncStudentSerializer(ANestedModelSerializer):
+            phone_numbers = NestedField(PhoneSerializer, many=True)
+
+            class Meta:
+                model = Student
+                fields = ['name', 'age', 'course', 'phone_numbers']
+
+        course = Course.objects.create(name="Programming", code="CS50")
+        serializer = AsyncStudentSerializer(
+            data={
+                "name": "Yezy",
+                "age": 33,
+                "course": course.pk,
+                "phone_numbers": {"create": [
+                    {"number": "076711110", "type": "Office"}
+                ]}
+            },
+            context={"request": APIRequestFactory().post("/")}
+        )
+        self.assertTrue(async_to_sync(serializer.ais_valid)())
+        student = async_to_sync(serializer.asave)()
+        self.assertEqual(
+            list(student.phone_numbers.values_list("number", flat=True)),
+            ["076711110"]
+        )
+        data = async_to_sync(serializer.adata)()
+        self.assertEqual(data["phone_numbers"][0]["number"], "076711110")
+
+    def test_collect_errors_of_all_operations(self):
+        class CollectErrorsCourseSerializer(NestedModelSerializer):
+            books = NestedField(BookSerializer, many=True, max_errors=3)
+
+            class Meta:
+                model = Course
+                fields = ['name', 'code', 'books']
+
+        course = Course.objects.create(name="Programming", code="CS50")
+        book = Book.objects.create(title="Python", author="S.Mobit")
+        course.books.add(book)
+        serializer = CollectErrorsCourseSerializer(
+            course,
+            data={"books": {
+                "update": {
+                    book.pk: {"title": "Python 3"},
+                    999: {"title": "Go", "author": "S.Mobit"}
+                },
+                "create": [
+                    {"title": "Rust"},
+                    {"title": "C", "author": "S.Mobit"},
+                    {"author": "S.Mobit"},
+                    {"title": "Java"}
+                ]
+            }},
+            context={"request": APIRequestFactory().patch("/")},
+            partial=True
+        )
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(
+            serializer.errors,
+            {"books": {
+                "update": {
+                    book.pk: {"author": ["This field is required."]},
+                    999: ['Invalid pk "999" - object does not exist.']
+                },
+                "create": {0: {"author": ["This field is required."]}}
+            }}
+        )
+
+    def test_deep_create_with_write_planner(self):
+        class DeepStudentSerializer(NestedModelSerializer):
+            phone_numbers = NestedField(PhoneSerializer, many=True)
+
+            class Meta:
+                model = Student
+                fields = ['name', 'age', 'phone_numbers']
+
+        class DeepCourseSerializer(NestedModelSerializer):
+            plan_deep_writes = True
+            books = NestedField(BookSerializer, many=True)
+            students = NestedField(DeepStudentSerializer, many=True)
+
+            class Meta:
+                model = Course
+                fields = ['name', 'code', 'books', 'students']
+
+        book = Book.objects.create(title="Python", author="S.Mobit")
+        serializer = DeepCourseSerializer(
+            data={
+                "name": "Programming",
+                "code": "CS50",
+                "books": {
+                    "add": [book.pk],
+                    "create": [
+                        {"title": "Rust", "author": "S.Mobit"},
+                        {"title": "Go", "author": "S.Mobit"}
+                    ]
+                },
+                "students": {"create": [
+                    {"name": "Yezy", "age": 33, "phone_numbers": {
+                        "create": [{"number": "076711110", "type": "Home"}]
+                    }},
+                    {"name": "Juma", "age": 24, "phone_numbers": {
+                        "create": [
+                            {"number": "076711111", "type": "Home"},
+                            {"number": "076711112", "type": "Office"}
+                        ]
+                    }}
+                ]}
+            },
+            context={"request": APIRequestFactory().post("/")}
+        )
+        serializer.is_valid(raise_exception=True)
+        with CaptureQueriesContext(connection) as queries:
+            course = serializer.save()
+        through_inserts = [
+            query["sql"] for query in queries.captured_queries
+            if query["sql"].startswith('INSERT INTO "testapp_course_books"')
+        ]
+        self.assertEqual(len(through_inserts), 1)
+        self.assertEqual(
+            sorted(course.books.values_list("title", flat=True)),
+            ["Go", "Python", "Rust"]
+        )
+        self.assertEqual(
+            {
+                student.name: sorted(
+                    student.phone_numbers.values_list("number", flat=True)
+                )
+                for student in course.students.all()
+            },
+            {
+                "Yezy": ["076711110"],
+                "Juma": ["076711111", "076711112"]
+            }
+        )
+
+    def test_unchanged_writable_foreignkey_is_not_updated(self):
+        class PlainCourseSerializer(ModelSerializer):
+            class Meta:
+                model = Course
+                fields = ['name', 'code']
+
+        class StudentSerializer(NestedModelSerializer):
+            course = NestedField(PlainCourseSerializer)
+
+            class Meta:
+                model = Student
+                fields = ['name', 'age', 'course']
+
+        course = Course.objects.create(name="Programming", code="CS50")
+        student = Student.objects.create(name="Yezy", age=33, course=course)
+        serializer = StudentSerializer(
+            student,
+            data={"course": {"name": "Programming", "code": "CS50"}},
+            context={"request": APIRequestFactory().patch("/")},
+            partial=True
+        )
+        serializer.is_valid(raise_exception=True)
+        with CaptureQueriesContext(connection) as queries:
+            serializer.save()
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if query["sql"].startswith('UPDATE "testapp_course"')
+        ])
+        self.assertEqual(serializer.nested_rows_written, {"course": 0})
+
+    def test_list_serializer_keeps_m2m_changed_signals(self):
+        book = Book.objects.create(title="Python", author="S.Mobit")
+        actions = []
+
+        def receiver(sender, action, **kwargs):
+            actions.append(action)
+
+        signals.m2m_changed.connect(receiver, sender=Course.books.through)
+        try:
+            serializer = WritableCourseSerializer(
+                data=[
+                    {
+                        "name": "Course %d" % i,
+                        "code": "CS%d" % i,
+                        "books": {"add": [book.pk]}
+                    }
+                    for i in range(2)
+                ],
+                many=True,
+                context={"request": APIRequestFactory().post("/")}
+            )
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+        finally:
+            signals.m2m_changed.disconnect(
+                receiver,
+                sender=Course.books.through
+            )
+        self.assertEqual(actions, ["pre_add", "post_add"] * 2)
+
+    def test_pk_cache_reaches_deeper_nested_fields(self):
+        book = Book.objects.create(title="Python", author="S.Mobit")
+        serializer = WritableStudentSerializer(
+            data=[
+                {
+                    "name": "Student %d" % i,
+                    "age": 20 + i,
+                    "course": {
+                        "name": "Programming",
+                        "code": "CS50",
+                        "books": {"add": [book.pk]}
+                    }
+                }
+                for i in range(3)
+            ],
+            many=True,
+            context={"request": APIRequestFactory().post("/")}
+        )
+        with CaptureQueriesContext(connection) as queries:
+            serializer.is_valid(raise_exception=True)
+        book_selects = [
+            query for query in queries.captured_queries
+            if query["sql"].startswith('SELECT "testapp_book"')
+        ]
+        self.assertEqual(len(book_selects), 1)
+
+    def test_many_init_keeps_meta_list_serializer_class(self):
+        class BookListSerializer(ListSerializer):
+            pass
+
+        class CustomListBookSerializer(BookSerializer):
+            class Meta(BookSerializer.Meta):
+                list_serializer_class = BookListSerializer
+
+        serializer = CustomListBookSerializer(many=True, allow_empty=False)
+        self.assertIs(type(serializer), BookListSerializer)
+        self.assertFalse(serializer.allow_empty)
+        self.assertIs(
+            type(BookSerializer(many=True)),
+            NestedListSerializer
+        )
+
+    def test_list_serializer_batches_nested_pk_operations(self):
+        books = [
+            Book.objects.create(title=title, author="S.Mobit")
+            for title in ["Python", "Rust", "Go"]
+        ]
+        serializer = WritableCourseSerializer(
+            data=[
+                {
+                    "name": "Course %d" % i,
+                    "code": "CS%d" % i,
+                    "books": {"add": [book.pk for book in books[:i + 1]]}
+                }
+                for i in range(3)
+            ],
+            many=True,
+            context={"request": APIRequestFactory().post("/")}
+        )
+        self.assertIsInstance(serializer, NestedListSerializer)
+        with CaptureQueriesContext(connection) as queries:
+            serializer.is_valid(raise_exception=True)
+        self.assertEqual(len(queries), 1)
+
+        with CaptureQueriesContext(connection) as queries:
+            courses = serializer.save()
+        through_inserts = [
+            query["sql"] for query in queries.captured_queries
+            if query["sql"].startswith('INSERT INTO "testapp_course_books"')
+        ]
+        self.assertEqual(len(through_inserts), 1)
+        with self.assertNumQueries(0):
+            data = serializer.data
+        self.assertEqual(
+            [len(course["books"]) for course in data],
+            [1, 2, 3]
+        )
+        self.assertEqual(courses[2].books.count(), 3)
+
+
+class ReplicaRouter(object):
+    # Reads go to the "other" replica, writes to "default"
+    def db_for_read(self, model, **hints):
+        return "other"
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+
+class DatabaseAliasTests(TestCase):
+    databases = {"default", "other"}
+
+    def test_update_diffs_against_write_database(self):
+        course = Course.objects.create(name="Programming", code="CS50")
+        book = Book.objects.create(title="Python", author="S.Mobit")
+        added = Book.objects.create(title="Go", author="S.Mobit")
+        course.books.add(book)
+        # The replica lags behind with an older title
+        for obj in (course, added):
+            obj.save(using="other", force_insert=True)
+        Book.objects.using("other").create(
+            pk=book.pk, title="Rust", author="S.Mobit"
+        )
+        Course.books.through.objects.using("other").create(
+            course_id=course.pk, book_id=book.pk
+        )
+
+        with override_settings(DATABASE_ROUTERS=[ReplicaRouter()]):
+            serializer = WritableCourseSerializer(
+                course,
+                data={"books": {
+                    "add": [added.pk],
+                    "update": {
+                        book.pk: {"title": "Rust", "author": "S.Mobit"}
+                    }
+                }},
+                context={"request": APIRequestFactory().patch("/")},
+                partial=True
+            )
+            with CaptureQueriesContext(connections["other"]) as reads:
+                serializer.is_valid(raise_exception=True)
+            serializer.save()
+        # "add" only checks pks exist, on the replica
+        self.assertEqual(len(reads), 1)
+        self.assertEqual(
+            Book.objects.using("default").get(pk=book.pk).title,
+            "Rust"
+        )
+
+    def test_create_on_nested_using(self):
+        for deep in (False, True):
+            class StudentSerializer(WritableStudentSerializer):
+                plan_deep_writes = deep
+
+            serializer = StudentSerializer(
+                data={
+                    "name": "Yezy",
+                    "age": 33,
+                    "course": {
+                        "name": "Programming",
+                        "code": "CS50",
+                        "books": {"create": [
+                            {"title": "Rust", "author": "S.Mobit"}
+                        ]}
+                    },
+                    "phone_numbers": {"create": [
+                        {"number": "076711110", "type": "office"}
+                    ]}
+                },
+                context={"request": APIRequestFactory().post("/")}
+            )
+            serializer.is_valid(raise_exception=True)
+            serializer.nested_using = "other"
+            student = serializer.save()
+            self.assertEqual(student._state.db, "other")
+            self.assertEqual(
+                serializer.data["course"]["books"][0]["title"],
+                "Rust"
+            )
+
+        for model in (Book, Course, Student, Phone):
+            self.assertEqual(model.objects.count(), 0)
+            self.assertEqual(model.objects.using("other").count(), 2)
+
+    def test_update_on_instance_database(self):
+        course = Course.objects.using("other").create(
+            name="Programming", code="CS50"
+        )
+        book = Book.objects.using("other").create(
+            title="Python", author="S.Mobit"
+        )
+        course.books.add(book)
+        student = Student.objects.using("other").create(
+            name="Yezy", age=33, course=course
+        )
+        phone1, phone2 = [
+            Phone.objects.using("other").create(
+                number=number, type="office", student=student
+            )
+            for number in ("076711110", "073008880")
+        ]
+
+        serializer = WritableStudentSerializer(
+            student,
+            data={
+                "course": {
+                    "name": "Data Structures",
+                    "code": "CS50",
+                    "books": {
+                        "update": {
+                            book.pk: {"title": "Rust", "author": "S.Mobit"}
+                        },
+                        "create": [{"title": "Go", "author": "S.Mobit"}]
+                    }
+                },
+                "phone_numbers": {
+                    "remove": [phone1.pk],
+                    "update": {
+                        phone2.pk: {"number": "073008880", "type": "home"}
+                    },
+                    "create": [{"number": "076750000", "type": "office"}]
+                }
+            },
+            partial=True,
+            context={"request": APIRequestFactory().patch("/")}
+        )
+        with CaptureQueriesContext(connection) as queries:
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+        self.assertEqual(len(queries), 0)
+
+        other = Course.objects.using("other").get()
+        self.assertEqual(other.name, "Data Structures")
+        self.assertEqual(
+            sorted(other.books.values_list("title", flat=True)),
+            ["Go", "Rust"]
+        )
+        phones = Phone.objects.using("other")
+        self.assertEqual(
+            sorted(phones.values_list("type", flat=True)),
+            ["home", "office"]
+        )
+
+    def test_queryset_bound_to_alias_keeps_it(self):
+        class OtherBooksCourseSerializer(NestedModelSerializer):
+            books = NestedField(
+                BookSerializer,
+                many=True,
+                queryset=Book.objects.using("other")
+            )
+
+            class Meta:
+                model = Course
+                fields = ['name', 'code', 'books']
+
+        book = Book.objects.using("other").create(
+            title="Python", author="S.Mobit"
+        )
+        course = Course.objects.create(name="Programming", code="CS50")
+        serializer = OtherBooksCourseSerializer(
+            course,
+            data={"books": {"add": [book.pk]}},
+            context={"request": APIRequestFactory().patch("/")},
+            partial=True
+        )
+        with CaptureQueriesContext(connections["other"]) as queries:
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(
+            serializer.validated_data["books"]["add"][0]._state.db,
+            "other"
+        )
+
+    def test_using_option_reads_pks(self):
+        class OtherBooksCourseSerializer(NestedModelSerializer):
+            books = NestedField(
+                BookSerializer, accept_pk=True, many=True, using="other"
+            )
+
+            class Meta:
+                model = Course
+                fields = ['name', 'code', 'books']
+
+        book = Book.objects.using("other").create(
+            title="Python", author="S.Mobit"
+        )
+        serializer = OtherBooksCourseSerializer(
+            data={"name": "Programming", "code": "CS50", "books": {
+                "add": [book.pk]
+            }},
+            context={"request": APIRequestFactory().post("/")}
+        )
+        with CaptureQueriesContext(connections["other"]) as queries:
+            self.assertTrue(serializer.is_valid())
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(
+            serializer.validated_data["books"]["add"][0]._state.db,
+            "other"
+        )
@@ -1,6 +1,14 @@
+from unittest import mock
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework.test import APITestCase
 from tests.testapp.models import Book, Course, Student, Phone
+from tests.testapp.serializers import BookSerializer, PhoneSerializer
+from drf_pretty_update.mixins import (
+    nested_write_measured, track_nested_writes
+)
 
 
 class ViewTests(APITestCase):
@@ -124,6 +132,23 @@ class ViewTests(APITestCase):
             }
         )
 
+    def test_post_validates_nested_data_once(self):
+        data = {
+                "name": "Data Structures",
+                "code": "CS310",
+                "books": {"create": [
+                    {"title": "Linear Math", "author": "Me"},
+                    {"title": "Algebra Three", "author": "Me"}
+                ]}
+        }
+        url = reverse("wcourse-list")
+        with mock.patch.object(
+                BookSerializer, "validate", 
+                autospec=True, side_effect=lambda self, attrs: attrs) as validate:
+            response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(validate.call_count, 2)
+
     def test_post_on_deep_nested_fields(self):
         url = reverse("wstudent-list")
         data = {
@@ -155,6 +180,35 @@ class ViewTests(APITestCase):
             }
         )
 
+    def test_post_on_deep_nested_fields_with_add_operation(self):
+        url = reverse("wstudent-list")
+        data = {
+            "name": "yezy",
+            "age": 33,
+            "course": {
+                "name": "Programming", 
+                "code": "CS50",
+                "books": {"add": [2]}
+            }
+        }
+        response = self.client.post(url, data, format="json")
+
+        self.assertEqual(
+            response.data,
+            {
+                'name': 'yezy', 
+                'age': 33, 
+                'course': {
+                    'name': 'Programming', 
+                    'code': 'CS50', 
+                    'books': [
+                        {'title': 'Basic Data Structures', 'author': 'S.Mobit'}
+                    ]
+                }, 
+                'phone_numbers': []
+            }
+        )
+
     def test_post_on_many_2_one_relation(self):
         url = reverse("wstudent-list")
         data = {
@@ -185,6 +239,175 @@ class ViewTests(APITestCase):
             }
         )
 
+    def test_post_with_add_operation_on_missing_pks(self):
+        url = reverse("rcourse-list")
+        data = {
+                "name": "Data Structures",
+                "code": "CS310",
+                "books": {"add": [1, 8, 2, 9]}
+        }
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.data,
+            {
+                "books": [
+                    'Invalid pk "8" - object does not exist.',
+                    'Invalid pk "9" - object does not exist.'
+                ]
+            }
+        )
+
+    def test_post_with_bulk_create_operation(self):
+        url = reverse("bcourse-list")
+        data = {
+                "name": "Data Structures",
+                "code": "CS310",
+                "books": {
+                    "add": [1],
+                    "create": [
+                        {"title": "Linear Math", "author": "Me"},
+                        {"title": "Algebra Three", "author": "Me"}
+                    ]
+                }
+        }
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(
+            response.data,
+            {
+                "name": "Data Structures",
+                "code": "CS310",
+                "books": [
+                    {'title': 'Advanced Data Structures', 'author': 'S.Mobit'},
+                    {"title": "Linear Math", "author": "Me"},
+                    {"title": "Algebra Three", "author": "Me"}
+                ]
+            }
+        )
+
+    def test_post_with_bulk_create_operation_on_many_2_one_relation(self):
+        url = reverse("bstudent-list")
+        data = {
+            "name": "yezy",
+            "age": 33,
+            "course": 2,
+            "phone_numbers": {
+                'create': [
+                    {'number': '076750000', 'type': 'office'},
+                    {'number': '076750001', 'type': 'home'}
+                ]
+            }
+        }
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(
+            response.data["phone_numbers"],
+            [
+                {'number': '076750000', 'type': 'office', 'student': 2},
+                {'number': '076750001', 'type': 'home', 'student': 2}
+            ]
+        )
+
+    def test_post_on_many_2_one_relation_with_invalid_data(self):
+        url = reverse("wstudent-list")
+        data = {
+            "name": "yezy",
+            "age": 33,
+            "course": {"name": "Programming", "code": "CS50"},
+            "phone_numbers": {
+                'create': [
+                    {'type': 'office'}
+                ]
+            }
+        }
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.data,
+            {"phone_numbers": [{"number": ["This field is required."]}]}
+        )
+        self.assertEqual(
+            PhoneSerializer.Meta.fields, 
+            ['number', 'type', 'student']
+        )
+
+    def test_post_with_chunked_create_operation(self):
+        url = reverse("cstudent-list")
+        data = {
+            "name": "yezy",
+            "age": 33,
+            "course": 2,
+            "phone_numbers": {
+                'create': [
+                    {'number': '07675000%d' % i, 'type': 'office'}
+                    for i in range(5)
+                ]
+            }
+        }
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(
+            [phone["number"] for phone in response.data["phone_numbers"]],
+            ['07675000%d' % i for i in range(5)]
+        )
+
+    def test_post_with_invalid_chunked_create_operation(self):
+        url = reverse("cstudent-list")
+        data = {
+            "name": "yezy",
+            "age": 33,
+            "course": 2,
+            "phone_numbers": {
+                'create': [
+                    {'number': '076750000', 'type': 'office'},
+                    {'number': '076750001', 'type': 'office'},
+                    {'number': '076750002', 'type': 'office'},
+                    {'type': 'office'}
+                ]
+            }
+        }
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.data,
+            {"phone_numbers": {3: {"number": ["This field is required."]}}}
+        )
+        self.assertEqual(Student.objects.count(), 1)
+        self.assertEqual(Phone.objects.count(), 2)
+
+    def test_post_with_add_and_create_operations(self):
+        url = reverse("wcourse-list")
+        data = {
+                "name": "Data Structures",
+                "code": "CS310",
+                "books": {
+                    "add": [2],
+                    "create": [{"title": "Linear Math", "author": "Me"}]
+                }
+        }
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(
+            response.data["books"],
+            [
+                {'title': 'Basic Data Structures', 'author': 'S.Mobit'},
+                {"title": "Linear Math", "author": "Me"}
+            ]
+        )
+
+    def test_post_with_set_operation(self):
+        url = reverse("rcourse-list")
+        data = {
+                "name": "Data Structures",
+                "code": "CS310",
+                "books": {"set": [2, 1]}
+        }
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(
+            response.data["books"],
+            [
+                {'title': 'Advanced Data Structures', 'author': 'S.Mobit'},
+                {'title': 'Basic Data Structures', 'author': 'S.Mobit'}
+            ]
+        )
+
     # **************** PUT Tests ********************* #
 
     def test_put_on_pk_nested_foreignkey_related_field(self):
@@ -212,6 +435,25 @@ class ViewTests(APITestCase):
             }
         )
 
+    def test_patch_on_pk_nested_foreignkey_related_field_saves_once(self):
+        url = reverse("rstudent-detail", args=[self.student.id])
+        data = {"name": "Juma", "course": 2}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(url, data, format="json")
+        self.assertEqual(response.status_code, 200)
+        updates = [
+            query["sql"] for query in queries.captured_queries
+            if query["sql"].startswith("UPDATE")
+        ]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"course_id" = 2', updates[0])
+        self.assertNotIn('"age"', updates[0])
+        self.student.refresh_from_db()
+        self.assertEqual(
+            (self.student.name, self.student.course_id),
+            ("Juma", 2)
+        )
+
     def test_put_on_writable_nested_foreignkey_related_field(self):
         url = reverse("wstudent-detail", args=[self.student.id])
         data = {
@@ -280,6 +522,74 @@ class ViewTests(APITestCase):
             }
         )
 
+    def test_put_with_set_operation(self):
+        book3 = Book.objects.create(title="Python Tricks", author="Dan Bader")
+        url = reverse("rcourse-detail", args=[self.course1.id])
+        data = {
+                "name": "Data Structures",
+                "code": "CS410",
+                "books": {
+                    "set": [2, book3.id]
+                }
+        }
+        response = self.client.put(url, data, format="json")
+        self.assertEqual(
+            response.data["books"],
+            [
+                {'title': 'Basic Data Structures', 'author': 'S.Mobit'},
+                {'title': 'Python Tricks', 'author': 'Dan Bader'}
+            ]
+        )
+
+    def test_put_with_set_operation_on_unchanged_links(self):
+        url = reverse("rcourse-detail", args=[self.course1.id])
+        data = {
+                "name": "Data Structures",
+                "code": "CS410",
+                "books": {
+                    "set": [1, 2]
+                }
+        }
+        with track_nested_writes() as metrics:
+            response = self.client.put(url, data, format="json")
+        self.assertEqual(response.status_code, 200)
+        # Only current links are read
+        self.assertEqual(metrics.records[0]["queries"], 1)
+
+    def test_patch_reads_back_nested_fields_once(self):
+        url = reverse("wstudent-detail", args=[self.student.id])
+        data = {
+            "phone_numbers": {
+                "update": {
+                    self.phone1.id: {"number": "076711111", "type": "Office"}
+                }
+            }
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(url, data, format="json")
+        self.assertEqual(response.status_code, 200)
+        # Validation looks phones up by pk, rendering by student
+        phone_selects = [
+            query["sql"] for query in queries.captured_queries
+            if query["sql"].startswith('SELECT "testapp_phone"') and
+            'WHERE "testapp_phone"."student_id"' in query["sql"]
+        ]
+        self.assertEqual(len(phone_selects), 1)
+        self.assertEqual(
+            response.data["phone_numbers"][0]["number"], "076711111"
+        )
+
+    def test_put_with_set_operation_on_many_2_one_relation(self):
+        url = reverse("wstudent-detail", args=[self.student.id])
+        data = {
+            "name": "yezy",
+            "age": 33,
+            "course": {"name": "Programming", "code": "CS50"},
+            "phone_numbers": {"set": [1]}
+        }
+        response = self.client.put(url, data, format="json")
+        self.assertEqual(response.status_code, 400)
+
     def test_put_with_create_operation(self):
         url = reverse("wcourse-detail", args=[self.course2.id])
         data = {
@@ -327,6 +637,53 @@ class ViewTests(APITestCase):
             }
         )
 
+    def test_put_with_update_operation_on_unrelated_pk(self):
+        url = reverse("wcourse-detail", args=[self.course2.id])
+        data = {
+                "name": "Data Structures",
+                "code": "CS310",
+                "books": {
+                    "update": {
+                        2: {"title": "React Programming", "author": "M.Json"}
+                    }
+                }
+        }
+        response = self.client.put(url, data, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.data,
+            {"books": ['Invalid pk "2" - object does not exist.']}
+        )
+        self.assertEqual(
+            Book.objects.get(pk=2).title,
+            "Basic Data Structures"
+        )
+
+    def test_put_is_rolled_back_on_failure(self):
+        student = Student.objects.create(
+            name="Juma", age=20, course=self.course2
+        )
+        phone = Phone.objects.create(
+            number="076700000", type="Home", student=student
+        )
+        url = reverse("wstudent-detail", args=[self.student.id])
+        data = {
+            "name": "yezy",
+            "age": 33,
+            "course": {"name": "Programming", "code": "CS50"},
+            "phone_numbers": {
+                'update': {
+                    phone.id: {'number': '073008811', 'type': 'office'}
+                }
+            }
+        }
+        response = self.client.put(url, data, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            Course.objects.get(pk=self.course1.id).name,
+            "Data Structures"
+        )
+
     def test_put_on_deep_nested_fields(self):
         url = reverse("wstudent-detail", args=[self.student.id])
         data = {
@@ -393,4 +750,222 @@ class ViewTests(APITestCase):
                     
                 ]
             }
-        )
\ No newline at end of file
+        )
+
+    def test_put_with_bulk_create_operation(self):
+        url = reverse("bcourse-detail", args=[self.course2.id])
+        data = {
+                "name": "Data Structures",
+                "code": "CS310",
+                "books": {
+                    "create": [
+                        {"title": "Primitive Data Types", "author": "S.Mobit"}
+                    ]
+                }
+        }
+        response = self.client.put(url, data, format="json")
+        self.assertEqual(
+            response.data,
+            {
+                "name": "Data Structures",
+                "code": "CS310",
+                "books": [
+                    {'title': 'Advanced Data Structures', 'author': 'S.Mobit'},
+                    {"title": "Primitive Data Types", "author": "S.Mobit"}
+                ]
+            }
+        )
+
+    def test_put_with_bulk_create_operation_on_many_2_one_relation(self):
+        url = reverse("bstudent-detail", args=[self.student.id])
+        data = {
+            "name": "yezy",
+            "age": 33,
+            "course": 2,
+            "phone_numbers": {
+                'create': [
+                    {'number': '076750000', 'type': 'office'}
+                ]
+            }
+        }
+        response = self.client.put(url, data, format="json")
+        self.assertEqual(
+            response.data["phone_numbers"],
+            [
+                {'number': '076711110', 'type': 'Office', 'student': 1}, 
+                {'number': '073008880', 'type': 'Home', 'student': 1},
+                {'number': '076750000', 'type': 'office', 'student': 1}
+            ]
+        )
+
+    def test_put_with_bulk_update_operation(self):
+        url = reverse("bcourse-detail", args=[self.course1.id])
+        data = {
+                "name": "Data Structures",
+                "code": "CS310",
+                "books": {
+                    "update": {
+                        1: {"title": "React Programming", "author": "M.Json"},
+                        2: {"title": "Vue Programming", "author": "M.Json"}
+                    }
+                }
+        }
+        response = self.client.put(url, data, format="json")
+        self.assertEqual(
+            response.data,
+            {
+                "name": "Data Structures",
+                "code": "CS310",
+                "books": [
+                    {"title": "React Programming", "author": "M.Json"},
+                    {"title": "Vue Programming", "author": "M.Json"}
+                ]
+            }
+        )
+
+    def test_put_with_bulk_update_operation_on_many_2_one_relation(self):
+        url = reverse("bstudent-detail", args=[self.student.id])
+        data = {
+            "name": "yezy",
+            "age": 33,
+            "course": 2,
+            "phone_numbers": {
+                'update': {
+                    1: {'number': '073008811', 'type': 'office'}
+                }
+            }
+        }
+        response = self.client.put(url, data, format="json")
+        self.assertEqual(
+            response.data["phone_numbers"],
+            [
+                {'number': '073008811', 'type': 'office', 'student': 1}, 
+                {'number': '073008880', 'type': 'Home', 'student': 1}
+            ]
+        )
+
+    def test_put_is_measured_per_field_and_operation(self):
+        url = reverse("wcourse-detail", args=[self.course1.id])
+        data = {
+                "name": "Data Structures",
+                "code": "CS310",
+                "books": {
+                    "remove": [1],
+                    "create": [
+                        {"title": "Primitive Data Types", "author": "S.Mobit"}
+                    ]
+                }
+        }
+        receiver = mock.Mock()
+        nested_write_measured.connect(receiver)
+        try:
+            with track_nested_writes() as metrics:
+                self.client.put(url, data, format="json")
+        finally:
+            nested_write_measured.disconnect(receiver)
+
+        self.assertEqual(
+            [(r["field"], r["operation"]) for r in metrics.records],
+            [("books", "remove"), ("books", "create")]
+        )
+        for record in metrics.records:
+            self.assertGreater(record["queries"], 0)
+            self.assertGreaterEqual(record["wall_time"], record["db_time"])
+        self.assertEqual(receiver.call_count, 2)
+        self.assertEqual(
+            list(metrics.summary()), 
+            [("books", "remove"), ("books", "create")]
+        )
+
+    def test_patch_with_chunked_create_operation(self):
+        url = reverse("cstudent-detail", args=[self.student.id])
+        data = {
+            "phone_numbers": {
+                'create': [
+                    {'number': '07675000%d' % i, 'type': 'office'}
+                    for i in range(3)
+                ]
+            }
+        }
+        response = self.client.patch(url, data, format="json")
+        self.assertEqual(
+            [phone["number"] for phone in response.data["phone_numbers"]],
+            ['076711110', '073008880'] +
+            ['07675000%d' % i for i in range(3)]
+        )
+
+    def test_patch_counts_rows_of_writable_foreignkey(self):
+        url = reverse("wstudent-detail", args=[self.student.id])
+        for name, rows in [("Algorithms", 1), ("Algorithms", 0)]:
+            data = {"course": {"name": name, "code": "CS210"}}
+            with track_nested_writes() as metrics:
+                response = self.client.patch(url, data, format="json")
+            self.assertEqual(response.status_code, 200)
+            course_records = [
+                record for record in metrics.records
+                if record["field"] == "course"
+            ]
+            self.assertEqual(course_records[0]["rows"], rows)
+
+    def test_patch_with_update_operation_skips_unchanged_rows(self):
+        for name in ["wcourse", "bcourse"]:
+            url = reverse(name + "-detail", args=[self.course1.id])
+            data = {
+                "books": {
+                    "update": {
+                        1: {"title": "Advanced Data Structures", "author": "S.Mobit"},
+                        2: {"title": "Basic Data Structures", "author": "M.Json"}
+                    }
+                }
+            }
+            with track_nested_writes() as metrics:
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.patch(url, data, format="json")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(metrics.records[0]["rows"], 1)
+            updates = [
+                query["sql"] for query in queries.captured_queries
+                if query["sql"].startswith("UPDATE")
+            ]
+            self.assertEqual(len(updates), 1)
+            self.assertNotIn('"title"', updates[0])
+            self.assertEqual(Book.objects.get(pk=2).author, "M.Json")
+            Book.objects.filter(pk=2).update(author="S.Mobit")
+
+    def test_patch_checks_pks_of_add_on_pk_column(self):
+        url = reverse("wcourse-detail", args=[self.course2.id])
+        data = {"books": {"add": [1, 2]}}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(url, data, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(any(
+            query["sql"].startswith(
+                'SELECT "testapp_book"."id" FROM "testapp_book" WHERE'
+            )
+            for query in queries.captured_queries
+        ))
+
+    def test_patch_validates_each_pk_once(self):
+        url = reverse("wcourse-detail", args=[self.course2.id])
+        data = {
+            "books": {
+                "add": [1, 2],
+                "update": {
+                    1: {"title": "Python", "author": "S.Mobit"},
+                    2: {"title": "Rust", "author": "S.Mobit"}
+                }
+            }
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(url, data, format="json")
+        self.assertEqual(response.status_code, 200)
+        book_selects = [
+            query["sql"] for query in queries.captured_queries
+            if query["sql"].startswith('SELECT "testapp_book"."id"') and
+            "INNER JOIN" not in query["sql"]
+        ]
+        self.assertEqual(len(book_selects), 1)
+        self.assertEqual(
+            sorted(Book.objects.values_list("title", flat=True)),
+            ["Python", "Rust"]
+        )
@@ -22,3 +22,8 @@ class Phone(models.Model):
     number = models.CharField(max_length=15)
     type = models.CharField(max_length=50)
     student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name="phone_numbers")
+
+
+class Note(models.Model):
+    text = models.CharField(max_length=100)
+    student = models.ForeignKey(Student, on_delete=models.SET_NULL, null=True, related_name="notes")
@@ -48,3 +48,46 @@ class WritableStudentSerializer(NestedModelSerializer):
         model = Student
         fields = ['name', 'age', 'course', 'phone_numbers']
 
+
+class BulkCourseSerializer(NestedModelSerializer):
+    books = NestedField(
+        BookSerializer, 
+        many=True, 
+        required=False, 
+        bulk_create=True, 
+        bulk_update=True, 
+        batch_size=100
+    )
+
+    class Meta:
+        model = Course
+        fields = ['name', 'code', 'books']
+
+
+class BulkStudentSerializer(NestedModelSerializer):
+    course = NestedField(WritableCourseSerializer, accept_pk=True)
+    phone_numbers = NestedField(
+        PhoneSerializer, 
+        many=True, 
+        required=False, 
+        bulk_create=True, 
+        bulk_update=True
+    )
+
+    class Meta:
+        model = Student
+        fields = ['name', 'age', 'course', 'phone_numbers']
+
+
+class ChunkedStudentSerializer(NestedModelSerializer):
+    course = NestedField(WritableCourseSerializer, accept_pk=True)
+    phone_numbers = NestedField(
+        PhoneSerializer,
+        many=True,
+        required=False,
+        chunk_size=2
+    )
+
+    class Meta:
+        model = Student
+        fields = ['name', 'age', 'course', 'phone_numbers']
@@ -5,7 +5,8 @@ from tests.testapp.models import Book, Course, Student
 from tests.testapp.serializers import (
 	BookSerializer, ReplaceableStudentSerializer,
 	WritableStudentSerializer, WritableCourseSerializer,
-	ReplaceableCourseSerializer
+	ReplaceableCourseSerializer, BulkCourseSerializer, BulkStudentSerializer,
+	ChunkedStudentSerializer
 )
 
 class BookViewSet( viewsets.ModelViewSet):
@@ -29,3 +30,18 @@ class ReplaceableStudentViewSet( viewsets.ModelViewSet):
 class WritableStudentViewSet( viewsets.ModelViewSet):
 	serializer_class = WritableStudentSerializer
 	queryset = Student.objects.all()
+
+
+class BulkCourseViewSet( viewsets.ModelViewSet):
+	serializer_class = BulkCourseSerializer
+	queryset = Course.objects.all()
+
+
+class BulkStudentViewSet( viewsets.ModelViewSet):
+	serializer_class = BulkStudentSerializer
+	queryset = Student.objects.all()
+
+
+class ChunkedStudentViewSet( viewsets.ModelViewSet):
+	serializer_class = ChunkedStudentSerializer
+	queryset = Student.objects.all()
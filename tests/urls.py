@@ -18,7 +18,8 @@ from django.urls import path, include
 from rest_framework import routers
 from tests.testapp.views import (
     BookViewSet, ReplaceableStudentViewSet, 
-    WritableStudentViewSet, WritableCourseViewSet, ReplaceableCourseViewSet
+    WritableStudentViewSet, WritableCourseViewSet, ReplaceableCourseViewSet,
+    BulkCourseViewSet, BulkStudentViewSet, ChunkedStudentViewSet
 )
 
 
@@ -28,6 +29,9 @@ router.register('writable-courses', WritableCourseViewSet, base_name='wcourse')
 router.register('replaceable-courses', ReplaceableCourseViewSet, base_name='rcourse')
 router.register('replaceable-students', ReplaceableStudentViewSet, base_name='rstudent')
 router.register('writable-students', WritableStudentViewSet, base_name='wstudent')
+router.register('bulk-courses', BulkCourseViewSet, base_name='bcourse')
+router.register('bulk-students', BulkStudentViewSet, base_name='bstudent')
+router.register('chunked-students', ChunkedStudentViewSet, base_name='cstudent')
 
 urlpatterns = [
     path('', include(router.urls))